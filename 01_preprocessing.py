@@ -1,15 +1,29 @@
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-import dataiku
+import os
 import logging
 import unicodedata
+import concurrent.futures
 import regex as re
 import numpy as np
 import pandas as pd
 
+from sts_pipeline.instrumentation import RunReport
+from sts_pipeline.parallel import ParallelTextMapper
+from sts_pipeline.routing import load_project_configs, route_project_columns
+from sts_pipeline.schema import PARTITION_COLUMNS, apply_category_schema
+from sts_pipeline.storage import get_storage
+from sts_pipeline.text_cleaning import clean_unique_texts
+
+# Sources and outputs go through the Dataiku flow, or a local directory when STS_LOCAL_DATA_DIR is set
+storage = get_storage()
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Stage timings, memory and per-rule row counts, written as a JSON run report at the end
+run_report = RunReport("01_preprocessing")
+
 # List of dataset names
 dataset_names = [
     "LMRC", "sts_chile_ns16", "sts_dubai", "sts_222_emr", "sts_india",
@@ -18,8 +32,27 @@ dataset_names = [
     "sts_xtrapolis_chile", "sts_vline_rrsmc", "sts_u400_Lyon", "sts_u400"
 ]
 
-# Load datasets into a dictionary of DataFrames
-dataframes = {name: dataiku.Dataset(name).get_dataframe() for name in dataset_names}
+# Ingestion settings: number of sources read concurrently and rows per chunk. Chunks are read without
+# per-chunk type inference, so a value reads the same ("5", not "5.0") whatever the rest of its chunk holds
+INGEST_WORKERS = 4
+INGEST_CHUNK_SIZE = 200000
+
+# Chunked execution streams INGEST_CHUNK_SIZE-row chunks of every source through all the steps
+# and appends them to the output, so peak memory depends on the chunk size, not the corpus size.
+# A pre-pass over the sources collects what the steps need from the whole corpus.
+CHUNKED_EXECUTION = False
+
+# Processes running the language cleaning (CPU-bound regex work); 1 cleans in this process
+CLEANING_WORKERS = 1
+text_mapper = ParallelTextMapper(CLEANING_WORKERS)
+run_report.annotate(
+    datasets=dataset_names, ingest_workers=INGEST_WORKERS, ingest_chunk_size=INGEST_CHUNK_SIZE,
+    chunked_execution=CHUNKED_EXECUTION, cleaning_workers=CLEANING_WORKERS,
+)
+
+def step_timer(name, rows_in):
+    """A stage of the in-memory run, or a timer accumulated over all chunks in chunked mode."""
+    return run_report.timer(f"chunk.{name}") if CHUNKED_EXECUTION else run_report.stage(name, rows_in=rows_in)
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Define patterns to identify absurd or meaningless text
@@ -36,16 +69,30 @@ INVALID_PATTERNS = [
     r"^-+$"                # Placeholder: ---- or ---
 ]
 
+COMPILED_INVALID_PATTERNS = [re.compile(pattern) for pattern in INVALID_PATTERNS]
+
+def remove_invalid_patterns(text):
+    """Apply every invalid pattern in order to a single stripped string value."""
+    for pattern in COMPILED_INVALID_PATTERNS:
+        text = pattern.sub("", text)
+    return text
+
 # Replace invalid patterns with an empty string
 def clean_column(dataframe, column_name):
     """
     Cleans a specific column of a DataFrame by replacing invalid patterns with an empty string.
-    Ensures all values are strings before applying the regex cleaning.
+    Values are converted to stripped strings, then the patterns are applied once per unique
+    value and the result is broadcast back to every row.
     """
     if column_name in dataframe.columns:
-        dataframe[column_name] = dataframe[column_name].astype(str).str.strip()
-        for pattern in INVALID_PATTERNS:
-            dataframe[column_name] = dataframe[column_name].replace(to_replace=pattern, value="", regex=True)
+        with run_report.timer(f"clean_column.{column_name}"):
+            values = dataframe[column_name].astype(str).str.strip()
+            codes, uniques = pd.factorize(values)
+            cleaned = np.array([remove_invalid_patterns(value) for value in uniques], dtype=object)
+            dataframe[column_name] = pd.Series(cleaned[codes], index=dataframe.index)
+            # Non-empty values the invalid patterns blanked out
+            blanked = (cleaned == "") & (np.asarray(uniques, dtype=object) != "")
+            run_report.count(f"clean_column.{column_name}.cells_blanked", int(np.bincount(codes, minlength=len(uniques))[blanked].sum()))
     return dataframe
 
 # Apply cleaning to specified columns
@@ -57,35 +104,37 @@ def clean_specified_columns(df, columns_to_clean):
 # Drop rows where 'observation' or 'solution' is empty
 def drop_empty_observation_or_solution(df):
     if 'observation' in df.columns and 'solution' in df.columns:
+        rows_before = len(df)
         df = df[(df['observation'].str.strip() != "") & (df['solution'].str.strip() != "")]
+        run_report.count("rows_dropped.empty_observation_or_solution", rows_before - len(df))
     return df
 
 # Columns to clean
 columns_to_clean = ["observation", "solution", "observationcategory", "solutioncategory", "problemcause"]
 
-# Process all datasets
-for name, df in dataframes.items():
-    df = clean_specified_columns(df, columns_to_clean)
-    df = drop_empty_observation_or_solution(df)
-    dataframes[name] = df
-
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Standardize metadata
-logger.info("Standardizing metadata...")
+METADATA_MODE_COLUMNS = ["project", "database", "language"]
 
-def standardize_metadata(df, name):
-    mode_values = {}
-    for col in ["project", "database", "language"]:
-        mode_values[col] = df[col].value_counts().idxmax() if col in df.columns and not df[col].dropna().empty else name
+def standardize_metadata(df, name, mode_values=None):
+    """
+    Fill missing project/database/language values with the most frequent value of the source,
+    or the source name when the column is missing or empty. `mode_values` gives modes computed
+    beforehand, e.g. over the whole source by the chunked pre-pass.
+    """
+    if mode_values is None:
+        mode_values = {
+            col: df[col].value_counts().idxmax() if col in df.columns and not df[col].dropna().empty else name
+            for col in METADATA_MODE_COLUMNS
+        }
+    for col in METADATA_MODE_COLUMNS:
         df[col] = df[col].fillna(mode_values[col]) if col in df.columns else mode_values[col]
     return df
 
-dataframes = {name: standardize_metadata(df, name) for name, df in dataframes.items()}
-logger.info("Metadata standardization complete! ✅")
+# Rows of this database are dropped
+EXCLUDED_DATABASE = "STS_U400_6.0"
 
 # Standardize inconsistent values
-logger.info("Standardizing inconsistent values...")
-
 def standardize_values(df, name):
     if name == "LMRC" and "language" in df.columns:
         df["language"] = df["language"].replace({"ENGLISH": "English"})
@@ -96,29 +145,176 @@ def standardize_values(df, name):
     if name == "sts_u400" and "language" in df.columns:
         df["language"] = df["language"].replace({"ENGLISH": "English", "SPANISH": "Spanish"})
     if "database" in df.columns:
-        df = df[df["database"] != "STS_U400_6.0"]
+        rows_before = len(df)
+        df = df[df["database"] != EXCLUDED_DATABASE]
+        run_report.count("rows_dropped.excluded_database", rows_before - len(df))
     return df
 
-dataframes = {name: standardize_values(df, name) for name, df in dataframes.items()}
-logger.info("Standardization of values complete! ✅")
+# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
+# Ingest, clean and standardize every source as it is read
+def ingest_dataset(name):
+    """
+    Read one source in chunks, clean each chunk and drop empty observations/solutions,
+    then standardize the source. Raw chunks are released as soon as they are cleaned.
+    """
+    cleaned_chunks = []
+    with run_report.timer(f"ingest.{name}"):
+        for chunk in storage.iter_chunks(name, INGEST_CHUNK_SIZE, infer_types=False):
+            run_report.count("ingest.rows_read", len(chunk))
+            chunk = clean_specified_columns(chunk, columns_to_clean)
+            cleaned_chunks.append(drop_empty_observation_or_solution(chunk))
+        df = pd.concat(cleaned_chunks, ignore_index=True) if cleaned_chunks else pd.DataFrame()
+        with run_report.timer("standardize_metadata"):
+            df = standardize_metadata(df, name)
+        with run_report.timer("standardize_values"):
+            return standardize_values(df, name)
+
+if not CHUNKED_EXECUTION:
+    logger.info(f"Ingesting {len(dataset_names)} datasets with {INGEST_WORKERS} workers...")
+    processed_frames = {}
+    with run_report.stage("ingest") as stage, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        future_to_name = {executor.submit(ingest_dataset, name): name for name in dataset_names}
+        for future in concurrent.futures.as_completed(future_to_name):
+            name = future_to_name[future]
+            processed_frames[name] = future.result()
+            logger.info(f"Ingested '{name}': {len(processed_frames[name])} rows")
+        stage["rows_out"] = sum(len(frame) for frame in processed_frames.values())
+    logger.info("Cleaning and standardization of all datasets complete! ✅")
+
+# Chunked mode: the pre-pass reads every source once more to collect the metadata modes of
+# standardize_metadata and the columns/dtypes the in-memory merge would produce
+def non_empty_observation_and_solution(chunk):
+    """Row mask of the rows drop_empty_observation_or_solution keeps once the chunk is cleaned."""
+    keep = np.ones(len(chunk), dtype=bool)
+    if 'observation' in chunk.columns and 'solution' in chunk.columns:
+        for column in ['observation', 'solution']:
+            codes, uniques = pd.factorize(chunk[column].astype(str).str.strip())
+            non_empty = np.array([remove_invalid_patterns(value).strip() != "" for value in uniques], dtype=bool)
+            keep &= non_empty[codes]
+    return keep
+
+def scan_source(name):
+    """
+    Pre-pass over one source: metadata modes over the rows kept after cleaning, column order
+    and dtypes, and the non-object columns with missing values on rows that reach the output.
+    """
+    counts = {col: {} for col in METADATA_MODE_COLUMNS}
+    columns, dtypes = [], {}
+    # Missing values on rows with a known database, and on rows whose database is filled with the mode
+    missing_known, missing_filled = set(), set()
+    rows_known = rows_filled = 0
+    for chunk in storage.iter_chunks(name, INGEST_CHUNK_SIZE, infer_types=False):
+        columns += [col for col in chunk.columns if col not in columns]
+        chunk = chunk[non_empty_observation_and_solution(chunk)]
+        if chunk.empty:
+            continue
+        for col in METADATA_MODE_COLUMNS:
+            if col in chunk.columns:
+                for value, count in chunk[col].value_counts(sort=False).items():
+                    counts[col][value] = counts[col].get(value, 0) + count
+        for col in chunk.columns:
+            # Cleaned and metadata columns always hold strings once standardized
+            dtype = np.dtype(object) if col in columns_to_clean or col in METADATA_MODE_COLUMNS else chunk[col].dtype
+            dtypes.setdefault(col, set()).add(dtype)
+
+        database = chunk["database"] if "database" in chunk.columns else pd.Series(name, index=chunk.index)
+        known = database.notna().to_numpy() & (database != EXCLUDED_DATABASE).to_numpy()
+        filled = database.isna().to_numpy()
+        rows_known += int(known.sum())
+        rows_filled += int(filled.sum())
+        for col in chunk.columns:
+            if dtype_kind(dtypes[col]) != "O":
+                missing = chunk[col].isna().to_numpy()
+                if (missing & known).any():
+                    missing_known.add(col)
+                if (missing & filled).any():
+                    missing_filled.add(col)
+
+    # Same tie-breaking as value_counts().idxmax() on the whole source
+    modes = {
+        col: pd.Series(counts[col], dtype="int64").sort_values(ascending=False).idxmax() if counts[col] else name
+        for col in METADATA_MODE_COLUMNS
+    }
+    fills_excluded = modes["database"] == EXCLUDED_DATABASE
+    return {
+        "modes": modes,
+        "columns": columns + [col for col in METADATA_MODE_COLUMNS if col not in columns],
+        "dtypes": dtypes,
+        "missing": missing_known if fills_excluded else missing_known | missing_filled,
+        "rows": rows_known + (0 if fills_excluded else rows_filled),
+    }
+
+def dtype_kind(dtypes):
+    """'O' when a column is stored as objects in any chunk, otherwise the kind of its first dtype."""
+    return "O" if any(dtype == object for dtype in dtypes) else next(iter(dtypes)).kind
+
+def plan_merged_columns(scans):
+    """
+    Columns and dtypes of the in-memory merge, from the scans of all sources in merge order:
+    returns ({column: dtype}, non-object columns that end up stored as strings because they
+    have missing values once merged).
+    """
+    order = []
+    for scan in scans:
+        order += [col for col in scan["columns"] if col not in order]
+    merged_dtypes, string_columns = {}, set()
+    for col in order:
+        seen = set().union(*(scan["dtypes"].get(col, set()) for scan in scans))
+        has_missing = any(col in scan["missing"] or (scan["rows"] and col not in scan["columns"]) for scan in scans)
+        if not seen or dtype_kind(seen) == "O" or len({dtype.kind == "b" for dtype in seen}) > 1:
+            dtype = np.dtype(object)
+        elif all(dtype.kind in "biuf" for dtype in seen):
+            dtype = np.result_type(*seen)
+            if has_missing and dtype.kind in "biu":
+                # Missing values upcast integers to floats and booleans to objects
+                dtype = np.dtype(object) if dtype.kind == "b" else np.dtype("float64")
+        else:
+            dtype = next(iter(seen)) if len(seen) == 1 else np.dtype(object)
+        merged_dtypes[col] = dtype
+        if has_missing and dtype != object:
+            string_columns.add(col)
+    return merged_dtypes, string_columns
+
+def conform_chunk(chunk, merged_dtypes):
+    """Give a chunk the columns, column order and dtypes of the in-memory merge."""
+    for col, dtype in merged_dtypes.items():
+        if col not in chunk.columns:
+            chunk[col] = pd.Series(np.nan, index=chunk.index, dtype=dtype)
+        elif chunk[col].dtype != dtype:
+            chunk[col] = chunk[col].astype(dtype)
+    return chunk[list(merged_dtypes)]
+
+def iter_standardized_chunks(name, mode_values):
+    """Chunks of one source cleaned and standardized like ingest_dataset, with the pre-pass modes."""
+    with run_report.timer(f"ingest.{name}"):
+        for chunk in storage.iter_chunks(name, INGEST_CHUNK_SIZE, infer_types=False):
+            run_report.count("ingest.rows_read", len(chunk))
+            chunk = clean_specified_columns(chunk, columns_to_clean)
+            chunk = drop_empty_observation_or_solution(chunk).copy()
+            with run_report.timer("standardize_metadata"):
+                chunk = standardize_metadata(chunk, name, mode_values)
+            with run_report.timer("standardize_values"):
+                yield standardize_values(chunk, name)
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Merge all dataframes
-logger.info("Merging all dataframes into a single dataset...")
-combined_df = pd.concat(dataframes.values(), ignore_index=True)
-logger.info(f"Merging complete! ✅ Final dataset has {combined_df.shape[0]} rows and {combined_df.shape[1]} columns.")
+if not CHUNKED_EXECUTION:
+    logger.info("Merging all dataframes into a single dataset...")
+    with run_report.stage("merge") as stage:
+        combined_df = pd.concat([processed_frames[name] for name in dataset_names], ignore_index=True)
+        processed_frames.clear()
+        stage["rows_out"] = len(combined_df)
+    logger.info(f"Merging complete! ✅ Final dataset has {combined_df.shape[0]} rows and {combined_df.shape[1]} columns.")
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Standardize language values
-logger.info("Standardizing language values...")
 language_mapping = {
     "ENGLISH": "English",
     "RUS": "Russian",
     "kazakh": "Kazakh",
     "SWEDISH": "Swedish"
 }
-if "language" in combined_df.columns:
-    combined_df["language"] = combined_df["language"].replace(language_mapping)
 
 valid_languages = {
     'english': 'en',
@@ -138,13 +334,21 @@ def standardize_language(lang):
         logger.warning(f"⚠️ Unknown language detected: {lang}")
     return valid_languages.get(lang, 'unknown')
 
-if "language" in combined_df.columns:
-    combined_df["language"] = combined_df["language"].apply(standardize_language)
+def standardize_language_column(df):
+    if "language" in df.columns:
+        df["language"] = df["language"].replace(language_mapping)
+        with step_timer("language_standardization", len(df)):
+            df["language"] = df["language"].apply(standardize_language)
+    return df
 
-# Log unique values and their count after standardization
-unique_languages = combined_df["language"].unique()
-logger.info(f"🔍 Unique values in 'language' after standardization: {unique_languages}")
-logger.info(f"Total unique values in 'language': {len(unique_languages)}")
+if not CHUNKED_EXECUTION:
+    logger.info("Standardizing language values...")
+    combined_df = standardize_language_column(combined_df)
+
+    # Log unique values and their count after standardization
+    unique_languages = combined_df["language"].unique()
+    logger.info(f"🔍 Unique values in 'language' after standardization: {unique_languages}")
+    logger.info(f"Total unique values in 'language': {len(unique_languages)}")
 
 # Language-specific cleaning rules
 LANGUAGE_CLEANERS = {
@@ -160,7 +364,6 @@ LANGUAGE_CLEANERS = {
     'sv': lambda text: re.sub(r'[åäö]', lambda m: m.group(0).lower().replace('å', 'a').replace('ä', 'a')
                                                                .replace('ö', 'o'), text),
 }
-
 # Main text cleaning function
 def clean_text(text, lang='generic'):
     try:
@@ -173,35 +376,77 @@ def clean_text(text, lang='generic'):
         logger.error(f"Error cleaning text for language '{lang}': {e}. Input text: {text}")
         return text
 
+# The data is cleaned by clean_unique_texts (sts_pipeline.text_cleaning), a precompiled equivalent
+# of clean_text; set to True to check the grouped cleaner against clean_text on a sample of rows
+VALIDATE_LANGUAGE_CLEANING = False
+VALIDATION_SAMPLE_SIZE = 10000
+
+def clean_text_column(df, column):
+    """
+    Language-aware cleaning of a column: rows are grouped by language and each
+    unique (language, text) pair is cleaned once, then broadcast back in row order.
+    """
+    values = df[column].to_numpy(dtype=object)
+    result = np.empty(len(values), dtype=object)
+    # Submit every language first, so that they are cleaned concurrently with several workers
+    pending = []
+    for lang, positions in df.groupby("language", sort=False).indices.items():
+        codes, uniques = pd.factorize(values[positions])
+        pending.append((positions, codes, text_mapper.submit(clean_unique_texts, uniques, lang)))
+    for positions, codes, cleaned in pending:
+        # Null values get code -1, which picks the trailing empty string
+        result[positions] = np.append(text_mapper.gather(cleaned), "")[codes]
+    return pd.Series(result, index=df.index)
+
 # Apply language-specific cleaning to relevant columns
-if "language" in combined_df.columns:
-    combined_df["language"] = combined_df["language"].fillna('unknown')
-    columns_to_clean = ["observationcategory", "observation", "problemcause", "solutioncategory", "solution"]
+language_cleaned_columns = ["observationcategory", "observation", "problemcause", "solutioncategory", "solution"]
+
+def clean_language_columns(df):
+    if "language" in df.columns:
+        df["language"] = df["language"].fillna('unknown')
+
+        for column in language_cleaned_columns:
+            if column in df.columns:
+                with step_timer(f"language_cleaning.{column}", len(df)):
+                    cleaned_column = clean_text_column(df, column)
+
+                if VALIDATE_LANGUAGE_CLEANING:
+                    sample = df.sample(min(VALIDATION_SAMPLE_SIZE, len(df)), random_state=0)
+                    expected = sample.apply(lambda row: clean_text(row[column], row["language"]), axis=1)
+                    mismatches = int((expected != cleaned_column.loc[sample.index]).sum())
+                    if mismatches:
+                        raise ValueError(f"Grouped cleaning differs from clean_text on {mismatches} sampled rows of '{column}'")
+                    logger.info(f"Validated grouped cleaning of '{column}' on {len(sample)} sampled rows")
+
+                df[column] = cleaned_column
+    return df
 
-    for column in columns_to_clean:
-        if column in combined_df.columns:
-            combined_df[column] = combined_df.apply(
-                lambda row: clean_text(row[column], row["language"]), axis=1
-            )
+if not CHUNKED_EXECUTION:
+    combined_df = clean_language_columns(combined_df)
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Standardize database values
-logger.info("Standardizing 'database' values...")
 database_mapping = {"Rex": "REX"}
-if "database" in combined_df.columns:
-    combined_df["database"] = combined_df["database"].replace(database_mapping)
 
-# Ensure metadata columns exist
-logger.info("Ensuring metadata columns exist...")
+# Metadata columns every row must have
 METADATA_COLUMNS = [
     'project', 'fleet', 'subsystem', 'database', 'observationcategory',
     'problemcode', 'problemcause', 'solutioncategory', 'language',
     'failureclass', 'date'
 ]
 
-for col in METADATA_COLUMNS:
-    if col not in combined_df.columns:
-        combined_df[col] = ""
+def standardize_database_and_metadata_columns(df):
+    if "database" in df.columns:
+        df["database"] = df["database"].replace(database_mapping)
+
+    for col in METADATA_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+if not CHUNKED_EXECUTION:
+    logger.info("Standardizing 'database' values and ensuring metadata columns exist...")
+    combined_df = standardize_database_and_metadata_columns(combined_df)
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 column_mapping = {
@@ -234,163 +479,114 @@ column_mapping = {
 }
 
 # Rename the columns in the combined_df DataFrame
-combined_df.rename(columns=column_mapping, inplace=True)
+if not CHUNKED_EXECUTION:
+    combined_df.rename(columns=column_mapping, inplace=True)
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Add new columns with default empty string values
 new_columns = ['category_id', 'obs_id', 'sol_category_id']
-for col in new_columns:
-    combined_df[col] = ""
-
-# Detect columns with mixed data types and convert them to strings
-mixed_type_columns = [
-    col for col in combined_df.columns if combined_df[col].map(type).nunique() > 1
-]
-for col in mixed_type_columns:
-    combined_df[col] = combined_df[col].astype(str)
-
-# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-def replace_nan_with_empty_string(df):
-    return df.replace(["NaN", np.nan, pd.NA], "", regex=False)
 
-combined_df = replace_nan_with_empty_string(combined_df)
+def has_mixed_types(series):
+    """Whether the values hold several Python types, nulls included; the types of the unique values are enough."""
+    return len({type(value) for value in series.unique()}) > 1
 
-# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-try:
-    # Define project configurations with exact case-sensitive names
-    project_configs = {
-        "LMRC": {
-            "textual_columns": ["problem_cause"],
-            "coded_columns": ["observation_category"]
-        },
-        "222 - EMR": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        },
-        "NS16": {
-            "textual_columns": [],
-            "coded_columns": []
-        },
-        "Dubai": {
-            "textual_columns": ["observation_category", "problem_cause"],
-            "coded_columns": []
-        },
-        "IND_E_Loco": {
-            "textual_columns": ["problem_cause"],
-            "coded_columns": []
-        },
-        "iTAC-Nantes": {
-            "textual_columns": ["problem_cause"],
-            "coded_columns": []
-        },
-        "Italy": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        },
-        "KZ4AT": {
-            "textual_columns": [],
-            "coded_columns": ["observation_category"]
-        },
-        "NET2": {
-            "textual_columns": ["observation_category", "problem_cause"],
-            "coded_columns": []
-        },
-        "KZ8A": {
-            "textual_columns": [],
-            "coded_columns": ["problem_cause"]
-        },
-        "Panama": {
-            "textual_columns": [],
-            "coded_columns": []
-        },
-        "REG2N": {
-            "textual_columns": ["observation_category", "problem_cause"],
-            "coded_columns": []
-        },
-        "REM": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": ["problem_cause"]
-        },
-        "U400 - Lyon": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        },
-        "VLINE RRSMC": {
-            "textual_columns": ["observation_category", "problem_cause"],
-            "coded_columns": []
-        },
-        "TIB": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        },
-        "Spain": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        },
-        "Merval": {
-            "textual_columns": ["problem_cause"],
-            "coded_columns": []
-        },
-        "U400": {
-            "textual_columns": ["observation_category"],
-            "coded_columns": []
-        }
-    }
+def add_new_columns_and_convert_strings(df):
+    for col in new_columns:
+        df[col] = ""
 
-    logger.info(f"Created project configuration mapping for {len(project_configs)} projects")
+    # Object columns mixing types (e.g. strings with NaN/None) are stored as strings; all-null
+    # columns stay null and become empty strings in replace_nan_with_empty_string
+    with step_timer("string_conversion", len(df)):
+        mixed_type_columns = [col for col in df.columns if df[col].dtype == object and has_mixed_types(df[col])]
+        for col in mixed_type_columns:
+            df[col] = df[col].astype(str)
+    return df
 
-    # Apply transformations to the actual dataset
-    logger.info("Starting to process the dataset rows")
-    result_frames = []
+if not CHUNKED_EXECUTION:
+    combined_df = add_new_columns_and_convert_strings(combined_df)
 
-    # Process each project's data separately
-    for project_name, project_df in combined_df.groupby("project"):
-        if project_name in project_configs:
-            logger.info(f"Processing {len(project_df)} rows for project {project_name}")
+# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
+def replace_nan_with_empty_string(df):
+    return df.replace(["NaN", np.nan, pd.NA], "", regex=False)
 
-            # Get project configuration
-            config = project_configs[project_name]
+def replace_nan_and_apply_schema(df):
+    with step_timer("replace_nan_and_schema", len(df)):
+        return apply_category_schema(replace_nan_with_empty_string(df))
 
-            # Initialize new columns with empty strings
-            project_df["observation_category_text"] = ""
-            project_df["observation_category_code"] = ""
-            project_df["problem_cause_text"] = ""
-            project_df["problem_cause_code"] = ""
+if not CHUNKED_EXECUTION:
+    combined_df = replace_nan_and_apply_schema(combined_df)
 
-            # Handle `observation_category`
-            if "observation_category" in config["textual_columns"]:
-                project_df["observation_category_text"] = project_df["observation_category"]
-            if "observation_category" in config["coded_columns"]:
-                project_df["observation_category_code"] = project_df["observation_category"]
+# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
+# Project configurations with exact case-sensitive names; set STS_PROJECT_CONFIG to use another file
+project_configs = load_project_configs(os.environ.get("STS_PROJECT_CONFIG"))
+logger.info(f"Loaded project configuration mapping for {len(project_configs)} projects")
+
+def route_projects(df):
+    """Route category/cause columns to their text or code columns in one pass, keeping row order."""
+    with step_timer("project_routing", len(df)):
+        df = apply_category_schema(route_project_columns(df, project_configs))
+    for project_name, count in df["project"].value_counts(sort=False).items():
+        if count:
+            run_report.count(f"rows_out.project.{project_name}", int(count))
+    return df
 
-            # Handle `problem_cause`
-            if "problem_cause" in config["textual_columns"]:
-                project_df["problem_cause_text"] = project_df["problem_cause"]
-            if "problem_cause" in config["coded_columns"]:
-                project_df["problem_cause_code"] = project_df["problem_cause"]
+if not CHUNKED_EXECUTION:
+    try:
+        logger.info("Starting to process the dataset rows")
+        for project_name, count in combined_df["project"].value_counts(sort=False).items():
+            if count:
+                logger.info(f"Processing {count} rows for project {project_name}")
+        sts_cmb_final_df = route_projects(combined_df)
+        logger.info(f"Created final DataFrame with {len(sts_cmb_final_df)} rows")
+        logger.info("Data processing pipeline completed successfully")
 
-            result_frames.append(project_df)
-        else:
-            logger.warning(f"No configuration found for project {project_name}")
-            project_df["observation_category_text"] = ""
-            project_df["observation_category_code"] = ""
-            project_df["problem_cause_text"] = ""
-            project_df["problem_cause_code"] = ""
-            result_frames.append(project_df)
-
-    # Combine all processed data
-    sts_cmb_final_df = pd.concat(result_frames, ignore_index=True)
-    logger.info(f"Created final DataFrame with {len(sts_cmb_final_df)} rows")
-    logger.info("Data processing pipeline completed successfully")
-
-except Exception as e:
-    logger.error(f"Error in data processing pipeline: {str(e)}", exc_info=True)
-    raise
+    except Exception as e:
+        logger.error(f"Error in data processing pipeline: {str(e)}", exc_info=True)
+        raise
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Save the enhanced knowledge base
-logging.info("Saving Processed knowledge base...")
 output_file = 'sts_cmb'
-output_dataset = dataiku.Dataset(output_file)
-output_dataset.write_with_schema(sts_cmb_final_df)
-logging.info(f"Processed knowledge base saved to '{output_file}'")
+
+def process_chunk(chunk, merged_dtypes, string_columns):
+    """Run one standardized chunk through every step that follows the in-memory merge."""
+    chunk = conform_chunk(chunk, merged_dtypes)
+    chunk = standardize_language_column(chunk)
+    chunk = clean_language_columns(chunk)
+    chunk = standardize_database_and_metadata_columns(chunk)
+    chunk = chunk.rename(columns=column_mapping)
+    chunk = add_new_columns_and_convert_strings(chunk)
+    chunk = replace_nan_and_apply_schema(chunk)
+    # Non-object columns with missing values end up as mixed objects in the merged DataFrame,
+    # stored as their string form; do the same in the chunks that have no missing value
+    for col in string_columns:
+        chunk[column_mapping.get(col, col)] = chunk[column_mapping.get(col, col)].astype(object)
+    return route_projects(chunk)
+
+if CHUNKED_EXECUTION:
+    with run_report.stage("pre_pass") as stage:
+        scans = {name: scan_source(name) for name in dataset_names}
+        merged_dtypes, string_columns = plan_merged_columns([scans[name] for name in dataset_names])
+        stage["columns"] = len(merged_dtypes)
+
+    logging.info(f"Processing and saving the knowledge base in chunks of {INGEST_CHUNK_SIZE} rows...")
+    with run_report.stage("chunked_processing") as stage, \
+            storage.open_writer(output_file, partition_cols=PARTITION_COLUMNS) as writer:
+        stage["rows_out"] = 0
+        for name in dataset_names:
+            for chunk in iter_standardized_chunks(name, scans[name]["modes"]):
+                if chunk.empty:
+                    continue
+                chunk = process_chunk(chunk, merged_dtypes, string_columns)
+                with run_report.timer("chunk.write"):
+                    writer.write(chunk)
+                stage["rows_out"] += len(chunk)
+            logger.info(f"Processed '{name}': {stage['rows_out']} rows written so far")
+    logging.info(f"Processed knowledge base saved to '{output_file}'")
+else:
+    logging.info("Saving Processed knowledge base...")
+    with run_report.stage("write", rows_in=len(sts_cmb_final_df)):
+        storage.write(output_file, sts_cmb_final_df, partition_cols=PARTITION_COLUMNS)
+    logging.info(f"Processed knowledge base saved to '{output_file}'")
+text_mapper.close()
+run_report.write()
@@ -1,68 +1,84 @@
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-import dataiku
 import pandas as pd, numpy as np
-from dataiku import pandasutils as pdu
 
-# Read recipe inputs
-sts_cmb = dataiku.Dataset("sts_cmb")
-sts_cmb_df = sts_cmb.get_dataframe(infer_with_pandas=False)
+from sts_pipeline.instrumentation import RunReport, iter_run_reports
+from sts_pipeline.local_translation import is_suspect_translation, length_batches, load_translator, route_to_local
+from sts_pipeline.near_duplicates import representative_texts
+from sts_pipeline.schema import PARTITION_COLUMNS, apply_category_schema
+from sts_pipeline.storage import get_storage
+from sts_pipeline.translation_need import classify_translation_need
 
-# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-# List of columns to check
-columns_to_check = ["observation_category_text", "observation", "solution", "solution_category", "problem_cause_text"]
+# Stage timings, memory, LLM call latencies/tokens and fallbacks, written as a JSON run report at the end
+run_report = RunReport("02_translation")
 
-# Check and print data types
-for column in columns_to_check:
-    dtype = sts_cmb_df[column].dtype if column in sts_cmb_df.columns else "Column not found"
-    print(f"Data type of '{column}': {dtype}")
+# Read recipe inputs (Dataiku flow, or a local directory when STS_LOCAL_DATA_DIR is set)
+storage = get_storage()
+with run_report.stage("read") as stage:
+    sts_cmb_df = apply_category_schema(storage.read("sts_cmb", infer_types=False))
+    stage["rows_out"] = len(sts_cmb_df)
 
-# -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-# List of columns to check
-columns_to_check = ["observation_category_text", "observation", "solution", "solution_category", "problem_cause_text"]
-
-# Check for mixed data types
-for column in columns_to_check:
-    if column in sts_cmb_df.columns:
-        unique_types = sts_cmb_df[column].apply(type).nunique()
-        print(f"Column '{column}' has mixed data types: {unique_types > 1}")
-    else:
-        print(f"Column '{column}' does not exist in the DataFrame.")
+# Translate one representative per cluster of near-identical observations/solutions (found by
+# 01b_near_duplicates) and give its translation to the other texts of the cluster; the records
+# keep their own source texts
+NEAR_DUPLICATE_COLLAPSING = False
+
+# Set to True to run the type diagnostics on a sample of rows
+VALIDATE_INPUTS = False
+VALIDATION_SAMPLE_SIZE = 10000
+
+def to_clean_string(series):
+    """Convert a column to stripped strings, with NaN/None as empty strings."""
+    return series.astype(object).astype(str).str.strip().where(series.notna(), "")
+
+def join_category(category, text):
+    """Vectorized "category-text", or just the text when the category is empty or missing."""
+    no_category = category.isna() | (category == "")
+    return text.where(no_category, category.astype(str) + "-" + text.astype(str))
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Columns to convert to string
 columns_to_convert = ["observation_category_text", "solution_category", "problem_cause_text"]
 
 # Convert columns to string and handle NaN
-for column in columns_to_convert:
-    if column in sts_cmb_df.columns:
-        sts_cmb_df[column] = sts_cmb_df[column].apply(lambda x: str(x).strip() if not pd.isna(x) else "")
+with run_report.stage("convert_columns"):
+    for column in columns_to_convert:
+        if column in sts_cmb_df.columns:
+            sts_cmb_df[column] = to_clean_string(sts_cmb_df[column])
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-# Create `observation_final` column
-sts_cmb_df['observation_final'] = sts_cmb_df.apply(
-    lambda row: row['observation'] if pd.isna(row['observation_category_text']) or row['observation_category_text'] == ''
-    else f"{row['observation_category_text']}-{row['observation']}",
-    axis=1
-)
+# Create `observation_final` and `solution_final` columns
+with run_report.stage("build_final_columns"):
+    sts_cmb_df['observation_final'] = join_category(sts_cmb_df['observation_category_text'], sts_cmb_df['observation'])
+    sts_cmb_df['solution_final'] = join_category(sts_cmb_df['solution_category'], sts_cmb_df['solution'])
 
-# Create `solution_final` column
-sts_cmb_df['solution_final'] = sts_cmb_df.apply(
-    lambda row: row['solution'] if pd.isna(row['solution_category']) or row['solution_category'] == ''
-    else f"{row['solution_category']}-{row['solution']}",
-    axis=1
-)
+# Texts translated in place of the final columns: the same final texts built from the near-duplicate
+# cluster representatives, so a cluster is translated once (empty when collapsing is disabled)
+translation_unit_texts = {}
+if NEAR_DUPLICATE_COLLAPSING:
+    with run_report.stage("collapse_near_duplicates"):
+        near_duplicates_df = storage.read("sts_near_duplicates", infer_types=False)
+        observation_source = representative_texts(sts_cmb_df, 'observation', near_duplicates_df)
+        solution_source = representative_texts(sts_cmb_df, 'solution', near_duplicates_df)
+        translation_unit_texts = {
+            'observation_final': join_category(sts_cmb_df['observation_category_text'], observation_source),
+            'solution_final': join_category(sts_cmb_df['solution_category'], solution_source),
+        }
+    run_report.count("rows.collapsed.observation", int((observation_source.fillna("") != sts_cmb_df['observation'].fillna("")).sum()))
+    run_report.count("rows.collapsed.solution", int((solution_source.fillna("") != sts_cmb_df['solution'].fillna("")).sum()))
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
-# List of columns to check for NoneType
-columns_to_check = ["solution_final", "observation_final", "problem_cause_text"]
-
-# Check for NoneType in each column
-for column in columns_to_check:
-    if column in sts_cmb_df.columns:
-        has_none = sts_cmb_df[column].apply(lambda x: isinstance(x, type(None))).any()
-        print(f"Column '{column}' contains NoneType: {has_none}")
-    else:
-        print(f"Column '{column}' does not exist in the DataFrame.")
+# Optional sampled validation: data types, mixed types and NoneType values
+if VALIDATE_INPUTS:
+    sample_df = sts_cmb_df.sample(min(VALIDATION_SAMPLE_SIZE, len(sts_cmb_df)), random_state=0)
+    columns_to_check = ["observation_category_text", "observation", "solution", "solution_category",
+                        "problem_cause_text", "solution_final", "observation_final"]
+    for column in columns_to_check:
+        if column in sample_df.columns:
+            unique_types = sample_df[column].map(type).nunique()
+            has_none = sample_df[column].map(lambda x: x is None).any()
+            print(f"Column '{column}': dtype {sample_df[column].dtype}, mixed data types: {unique_types > 1}, contains NoneType: {has_none}")
+        else:
+            print(f"Column '{column}' does not exist in the DataFrame.")
 
 # -------------------------------------------------------------------------------- NOTEBOOK-CELL: CODE
 # Import necessary libraries
@@ -70,19 +86,23 @@ import dataiku
 import pandas as pd
 import numpy as np
 import datetime
+import functools
 import concurrent.futures
-from tqdm.notebook import tqdm
+from tqdm.auto import tqdm
 import logging
 import re
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Utility functions
-def is_removable(val):
-    """Check if a value should be considered removable."""
-    return val is None or pd.isna(val) or str(val).strip().lower() in ["nan", "none", ""]
-
 def is_numeric_or_alphanumeric(value):
     """Check if the value is numeric or alphanumeric."""
     return bool(re.fullmatch(r'[A-Za-z0-9]+', str(value).strip()))
@@ -90,38 +110,343 @@ def is_numeric_or_alphanumeric(value):
 def clean_columns(df, columns):
     """Clean specified columns in the DataFrame by replacing invalid values with an empty string."""
     for col in columns:
-        df[col] = df[col].apply(lambda x: "" if is_removable(x) else str(x).strip())
+        stripped = df[col].astype(object).astype(str).str.strip()
+        removable = df[col].isna() | stripped.str.lower().isin(["nan", "none", ""])
+        df[col] = stripped.where(~removable, "")
     return df
 
-def translate_record(record_data, llm, language_map):
-    """Translate a single record using the provided LLM."""
-    index, row_dict, language = record_data
-    translations = {}
-    lang_name = language_map.get(language, "Unknown")
+def normalize_source_text(text):
+    """Normalize source text for cache lookups (collapse whitespace)."""
+    return " ".join(str(text).split())
 
-    columns_to_translate = ["observation_final", "solution_final", "problem_cause_text"]
+class TranslationCache:
+    """Persistent SQLite cache of translations keyed on language, normalized text, prompt version and LLM."""
 
-    for column in columns_to_translate:
-        value = row_dict.get(column, "")
-        original_text = str(value).strip() if value else ""
+    def __init__(self, path, prompt_version, llm_id):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.llm_id = llm_id
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, language TEXT, source_text TEXT, "
+            "prompt_version TEXT, llm_id TEXT, translation TEXT)"
+        )
+        self._conn.commit()
 
-        # Skip translation for numeric or alphanumeric values
-        if is_numeric_or_alphanumeric(original_text):
-            translations[f"{column}_translated"] = original_text
-            continue
+    def _key(self, language, text):
+        raw = "\x1f".join([str(language), normalize_source_text(text), str(self.prompt_version), self.llm_id])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-        if not original_text:
-            # If original text is empty, ensure translation column is also empty
-            translations[f"{column}_translated"] = ""
-            continue
+    def get(self, language, text):
+        """Return the cached translation or None, updating the hit/miss counters."""
+        key = self._key(language, text)
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
 
-        if language == "en":
-            # If the language is English, no translation is needed
-            translations[f"{column}_translated"] = original_text
-            continue
+    def put(self, language, text, translation):
+        """Store a successful translation."""
+        key = self._key(language, text)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                (key, language, normalize_source_text(text), str(self.prompt_version), self.llm_id, translation),
+            )
+            self._conn.commit()
+
+    def contains(self, language, text):
+        """Whether a translation is cached, without updating the hit/miss counters."""
+        key = self._key(language, text)
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM translations WHERE key = ?", (key,)).fetchone() is not None
+
+    def sample(self, language, limit):
+        """Up to `limit` cached (source text, translation) pairs of a language for this prompt version and LLM."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source_text, translation FROM translations WHERE language = ? AND prompt_version = ? AND llm_id = ? LIMIT ?",
+                (str(language), str(self.prompt_version), self.llm_id, limit),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class AdaptiveLimiter:
+    """
+    Global in-flight limit for LLM calls with AIMD control: the limit grows by
+    about one slot per round of successful calls and is halved on throttling.
+    """
+
+    def __init__(self, initial, minimum, maximum):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+class TranslationStats:
+    """Thread-safe request, retry and latency counters for the translation engine."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.latencies = []
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, latency, throttled=False):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.throttled += int(throttled)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            latencies = sorted(self.latencies)
+            return {
+                "requests": self.requests,
+                "requests_per_sec": self.requests / elapsed if elapsed > 0 else 0.0,
+                "p50_latency": float(np.percentile(latencies, 50)) if latencies else 0.0,
+                "p95_latency": float(np.percentile(latencies, 95)) if latencies else 0.0,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+            }
+
+class TranslationBudgetExceeded(Exception):
+    """Raised instead of making an LLM call that would go over the run's token or request budget."""
+
+class TranslationBudget:
+    """
+    Thread-safe token and request budget of one run; a limit of None is unlimited. Prompt tokens
+    are charged before each call (retries included) and completion tokens once it returns, so
+    calls already in flight when the budget runs out can overshoot it by their completions.
+    """
 
-        # Translation prompt
-        message_text = f"""
+    def __init__(self, max_tokens=None, max_requests=None):
+        self.max_tokens = max_tokens
+        self.max_requests = max_requests
+        self.tokens = 0
+        self.requests = 0
+        self.exceeded = False
+        self._lock = threading.Lock()
+
+    def charge_request(self, prompt_tokens):
+        """Account for a call about to be made, or raise TranslationBudgetExceeded if it does not fit."""
+        with self._lock:
+            over_requests = self.max_requests is not None and self.requests + 1 > self.max_requests
+            over_tokens = self.max_tokens is not None and self.tokens + prompt_tokens > self.max_tokens
+            if self.exceeded or over_requests or over_tokens:
+                self.exceeded = True
+                raise TranslationBudgetExceeded(
+                    f"Translation budget reached: {self.requests} requests and {self.tokens} tokens used "
+                    f"(limits: {self.max_requests} requests, {self.max_tokens} tokens)"
+                )
+            self.requests += 1
+            self.tokens += prompt_tokens
+
+    def charge_completion(self, completion_tokens):
+        with self._lock:
+            self.tokens += completion_tokens
+
+    def summary(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "max_requests": self.max_requests,
+                "max_tokens": self.max_tokens,
+                "exceeded": self.exceeded,
+            }
+
+THROTTLE_PATTERN = re.compile(r"429|rate.?limit|too many requests|timed? ?out", re.IGNORECASE)
+
+def is_throttled(message):
+    """Check if an LLM error message indicates throttling or a timeout."""
+    return bool(THROTTLE_PATTERN.search(str(message)))
+
+class LLMClient:
+    """
+    Wraps a Dataiku LLM with the adaptive concurrency limit, retries with jittered exponential
+    backoff, stats and an optional TranslationBudget.
+    """
+
+    def __init__(self, llm, limiter, stats, max_retries, backoff_base, backoff_max, budget=None):
+        self.llm = llm
+        self.limiter = limiter
+        self.stats = stats
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+
+    def complete(self, message_text):
+        """
+        Return the completion text, or None once all retries are exhausted.
+        Raises TranslationBudgetExceeded when the budget leaves no room for the call.
+        """
+        prompt_tokens = count_tokens(message_text)
+        for attempt in range(self.max_retries):
+            if attempt:
+                self.stats.record_retry()
+                # Full jitter: sleep a random time up to the exponential cap
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+            if self.budget is not None:
+                self.budget.charge_request(prompt_tokens)
+            self.limiter.acquire()
+            start = time.monotonic()
+            throttled = False
+            run_report.count("llm.prompt_tokens_estimate", prompt_tokens)
+            try:
+                completion = self.llm.new_completion()
+                completion.with_message(message_text)
+                resp = completion.execute()
+                if resp.success:
+                    completion_tokens = count_tokens(resp.text or "")
+                    run_report.count("llm.completion_tokens_estimate", completion_tokens)
+                    if self.budget is not None:
+                        self.budget.charge_completion(completion_tokens)
+                    return resp.text
+                throttled = is_throttled(resp.text)
+                logging.warning(f"LLM call failed (attempt {attempt + 1}/{self.max_retries}). Response: {resp.text}")
+            except Exception as e:
+                throttled = is_throttled(e)
+                logging.warning(f"LLM call error (attempt {attempt + 1}/{self.max_retries}): {e}")
+            finally:
+                latency = time.monotonic() - start
+                self.stats.record(latency, throttled=throttled)
+                run_report.observe("llm.latency_seconds", latency)
+                self.limiter.release(throttled=throttled)
+
+        self.stats.record_failure()
+        return None
+
+def compute_row_hashes(df, columns, prompt_version, llm_id, settings=(), unit_texts=None):
+    """
+    Stable per-row hash of the language and source texts to translate, the texts translated in
+    their place (`unit_texts`, as in plan_translation_units) and the translation `settings`, so
+    changing any of them retranslates the row instead of reusing its checkpointed translation.
+    """
+    unit_texts = unit_texts or {}
+    parts = [df["language"].astype(str)] + [
+        df[col].astype(str) if col in df.columns else pd.Series("", index=df.index) for col in columns
+    ] + [unit_texts[col].reindex(df.index).astype(str) for col in columns if col in unit_texts]
+    suffix = "\x1f".join(["", str(prompt_version), llm_id, *map(str, settings)])
+    return pd.Series(
+        [hashlib.sha256(("\x1f".join(values) + suffix).encode("utf-8")).hexdigest() for values in zip(*parts)],
+        index=df.index,
+    )
+
+class TranslationCheckpoint:
+    """
+    Append-only JSONL file of completed row translations keyed by row hash.
+    Completed rows are buffered and flushed every `flush_every` rows; after a
+    successful output write the file is compacted to the rows of that output,
+    so it doubles as the state for incremental runs.
+    """
+
+    def __init__(self, path, flush_every):
+        self.path = path
+        self.flush_every = flush_every
+        self.records = {}
+        self._buffer = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.records[record["row_hash"]] = record["translations"]
+                    except (ValueError, KeyError, TypeError):
+                        # A crash can leave a truncated last line; malformed records are skipped too
+                        continue
+
+    def add(self, row_hash, translations):
+        self.records[row_hash] = translations
+        self._buffer.append({"row_hash": row_hash, "translations": translations})
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in self._buffer:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer = []
+
+    def compact(self, row_hashes):
+        """Rewrite the checkpoint keeping only the given row hashes."""
+        self.flush()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row_hash in row_hashes:
+                if row_hash in self.records:
+                    f.write(json.dumps({"row_hash": row_hash, "translations": self.records[row_hash]}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.records = {h: self.records[h] for h in row_hashes if h in self.records}
+
+def resolve_without_llm(text, language):
+    """
+    Return (translation, route) of a cell: the translation is None if the cell must be sent
+    to the LLM, and the route records why it was or was not (the audit column).
+    """
+    # Skip translation for numeric or alphanumeric values
+    if is_numeric_or_alphanumeric(text):
+        return text, "alphanumeric"
+    # If original text is empty, ensure translation column is also empty
+    if not text:
+        return "", "empty"
+    # If the language is English, no translation is needed
+    if language == "en":
+        return text, "english"
+    # Local pre-classifier: codes, numbers or English text in a non-English record
+    if FAST_PATH_CLASSIFIER:
+        route = classify_translation_need(text, language)
+        if route is not None:
+            return text, route
+    return None, "llm"
+
+def build_translation_prompt(lang_name, original_text):
+    """Prompt translating a single text."""
+    return f"""
         You are a professional language translator specializing in technical content. Your task is to translate the following text from {lang_name} to English with precision and clarity, adhering strictly to the following rules:
 
         1. Return **only** the translated text—no comments, explanations, or annotations.
@@ -134,74 +459,491 @@ def translate_record(record_data, llm, language_map):
         Translate this input: '{original_text}'
         """
 
-        for attempt in range(MAX_RETRIES):
-            try:
-                completion = llm.new_completion()
-                completion.with_message(message_text)
-                resp = completion.execute()
+def translate_text(unit, llm, language_map, cache=None, lookup=True):
+    """
+    Translate a single (language, text) unit using the provided LLMClient; the translation is
+    None when it failed. `lookup=False` skips the cache lookup for a unit the caller already missed.
+    """
+    language, original_text = unit
+    lang_name = language_map.get(language, "Unknown")
+    translation = None
 
-                if resp.success:
-                    translations[f"{column}_translated"] = resp.text.strip()
-                    break
-                else:
-                    logging.error(f"Translation failed for index {index}, column {column}, language {lang_name}. Response: {resp.text}")
-                    if attempt == MAX_RETRIES - 1:
-                        translations[f"{column}_translated"] = original_text
+    # Reuse a previous translation before calling the LLM
+    if cache is not None and lookup:
+        cached = cache.get(language, original_text)
+        if cached is not None:
+            return unit, cached
+
+    resp_text = llm.complete(build_translation_prompt(lang_name, original_text))
+    if resp_text is not None:
+        translation = resp_text.strip()
+        if cache is not None and translation:
+            cache.put(language, original_text, translation)
+    else:
+        logging.error(f"Translation failed for language {lang_name}, text '{original_text}'")
+
+    return unit, translation or None
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token) used for batch packing."""
+    return len(text) // 4 + 1
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(encoding_name):
+    """tiktoken encoding of the LLM, or None when tiktoken or its encoding files are not available."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logging.warning(f"Tokenizer '{encoding_name}' unavailable ({e}); estimating tokens from characters")
+        return None
+
+def count_tokens(text):
+    """Tokens of a prompt or completion with the local tokenizer of the LLM, or estimate_tokens without it."""
+    tokenizer = load_tokenizer(TOKENIZER_ENCODING)
+    return len(tokenizer.encode(text, disallowed_special=())) if tokenizer is not None else estimate_tokens(text)
+
+def pack_segments(units, token_budget, max_segments):
+    """Pack (language, text) units into same-language batches that fit the token budget."""
+    by_language = {}
+    for unit in units:
+        by_language.setdefault(unit[0], []).append(unit)
+
+    batches = []
+    for language_units in by_language.values():
+        batch, batch_tokens = [], 0
+        for unit in language_units:
+            tokens = estimate_tokens(unit[1])
+            if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_segments):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(unit)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+    return batches
+
+def parse_batch_response(text, expected_count):
+    """Parse a JSON list of translations from an LLM response; return None if it is malformed or misaligned."""
+    if not text:
+        return None
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(parsed, list) or len(parsed) != expected_count:
+        return None
+    if not all(isinstance(item, str) for item in parsed):
+        return None
+    return [item.strip() for item in parsed]
+
+def build_batch_translation_prompt(lang_name, segments):
+    """Prompt translating a JSON array of same-language texts."""
+    return f"""
+        You are a professional language translator specializing in technical content. Your task is to translate each text in the following JSON array from {lang_name} to English with precision and clarity, adhering strictly to the following rules:
+
+        1. Return **only** a JSON array of exactly {len(segments)} strings—no comments, explanations, or annotations.
+        2. The translation at position i of the output must correspond to the text at position i of the input.
+        3. Ensure a **highly accurate** translation; do not introduce any fabricated or altered information.
+        4. Clean the text by removing Unicode artifacts and special characters, but **do not add or alter punctuation**.
+        5. Preserve all numeric and alphanumeric strings (e.g., codes or identifiers) in the text phrase **exactly as they appear**.
+        6. Maintain the **original technical meaning and context** without embellishment.
+
+        Translate this input: {json.dumps(segments, ensure_ascii=False)}
+        """
+
+def translate_batch(batch, llm, language_map, cache=None):
+    """
+    Translate a batch of same-language units with a single prompt.
+    Segments the LLM drops, misaligns or leaves empty fall back to one prompt per segment;
+    when the call itself fails, every segment is returned as failed (None).
+    """
+    if len(batch) == 1:
+        return [translate_text(batch[0], llm, language_map, cache)]
+
+    results = []
+    pending = []
+    for unit in batch:
+        cached = cache.get(*unit) if cache is not None else None
+        if cached is not None:
+            results.append((unit, cached))
+        else:
+            pending.append(unit)
+    if not pending:
+        return results
+
+    language = pending[0][0]
+    lang_name = language_map.get(language, "Unknown")
+    segments = [text for _, text in pending]
+
+    resp_text = llm.complete(build_batch_translation_prompt(lang_name, segments))
+    if resp_text is None:
+        # The call failed after all retries (e.g. throttling): more prompts would only add to the load
+        logging.error(f"Batch translation failed for language {lang_name} ({len(pending)} segments)")
+        return results + [(unit, None) for unit in pending]
+
+    translations = parse_batch_response(resp_text, len(segments))
+    if translations is None:
+        logging.warning(f"Unaligned batch response for language {lang_name} ({len(segments)} segments)")
+        logging.info(f"Falling back to per-segment translation for {len(pending)} {lang_name} segments")
+        run_report.count("translation.batch_fallbacks")
+        run_report.count("translation.segments_retranslated", len(pending))
+        return results + [translate_text(unit, llm, language_map, cache, lookup=False) for unit in pending]
+
+    for unit, translation in zip(pending, translations):
+        if translation:
+            if cache is not None:
+                cache.put(unit[0], unit[1], translation)
+            results.append((unit, translation))
+        else:
+            run_report.count("translation.segments_retranslated")
+            results.append(translate_text(unit, llm, language_map, cache, lookup=False))
+    return results
+
+def translate_local(units, translator, cache=None, local_cache=None):
+    """
+    Translate units with the local backend, in batches of one language and similar lengths.
+    Returns the units whose LLM translation is cached (reused as is), the units translated
+    locally (or cached from an earlier local run), and the units escalated to the LLM because
+    the backend failed or its output looks wrong.
+    """
+    llm_cached, translated, escalated, pending = [], [], [], {}
+    for unit in units:
+        if cache is not None and cache.contains(*unit):
+            llm_cached.append((unit, cache.get(*unit)))
+            continue
+        cached = local_cache.get(*unit) if local_cache is not None else None
+        if cached is not None:
+            translated.append((unit, cached))
+        else:
+            pending.setdefault(unit[0], []).append(unit)
+
+    for language, language_units in pending.items():
+        texts = [text for _, text in language_units]
+        for batch in length_batches(texts, LOCAL_TRANSLATION_BATCH_SIZE):
+            try:
+                with run_report.timer("translation.local_batch"):
+                    outputs = translator.translate(language, [texts[i] for i in batch])
             except Exception as e:
-                if attempt == MAX_RETRIES - 1:
-                    logging.error(f"Final error during translation for index {index}, column {column}: {e}")
-                    translations[f"{column}_translated"] = original_text
-                else:
-                    logging.warning(f"Retrying translation for index {index}, column {column}, attempt {attempt + 1}: {e}")
+                logging.error(f"Local translation failed for {len(batch)} {language} units: {e}")
+                escalated += [language_units[i] for i in batch]
+                continue
+            if len(outputs) != len(batch):
+                logging.error(f"Local backend returned {len(outputs)} translations for {len(batch)} {language} units")
+                escalated += [language_units[i] for i in batch]
+                continue
+            for i, translation in zip(batch, outputs):
+                unit = language_units[i]
+                if is_suspect_translation(unit[1], translation):
+                    escalated.append(unit)
+                    continue
+                if local_cache is not None:
+                    local_cache.put(language, unit[1], translation)
+                translated.append((unit, translation))
+    return llm_cached, translated, escalated
 
-        # Fallback to the original text if translation is unsuccessful
-        if original_text and not translations.get(f"{column}_translated"):
-            translations[f"{column}_translated"] = original_text
+def split_local_units(units, translator):
+    """Units the routing policy sends to the local backend, and units left to the LLM."""
+    if translator is None:
+        return [], list(units)
+    local_units, llm_units = [], []
+    for unit in units:
+        if route_to_local(*unit, translator.languages, LOCAL_TRANSLATION_MAX_WORDS):
+            local_units.append(unit)
+        else:
+            llm_units.append(unit)
+    return local_units, llm_units
 
-    return index, translations
+def plan_translation_units(df, columns, unit_texts=None):
+    """
+    Collapse all cells of `columns` into unique (language, text) translation units.
+    `unit_texts` optionally maps a column to the text translated in place of each cell's own
+    (its near-duplicate representative), so the cells of a cluster share one unit.
+    Returns the units mapped to their originating (index, column) cells, and the
+    results already resolved without the LLM.
+    """
+    units = {}
+    results = {idx: {} for idx in df.index}
+    for column in columns:
+        values = df[column] if column in df.columns else pd.Series("", index=df.index)
+        sources = unit_texts[column].reindex(df.index) if unit_texts and column in unit_texts else values
+        for idx, value, source, language in zip(df.index, values, sources, df["language"]):
+            original_text = str(value).strip() if value else ""
+            resolved, route = resolve_without_llm(original_text, language)
+            results[idx][f"{column}_translation_route"] = route
+            if resolved is not None:
+                results[idx][f"{column}_translated"] = resolved
+                continue
+            source_text = str(source).strip() if isinstance(source, str) else ""
+            key = (language, normalize_source_text(source_text or original_text))
+            units.setdefault(key, []).append((idx, f"{column}_translated"))
+    return units, results
 
-def process_in_batches(df, llm, language_map, batch_size=100):
-    """Process records in batches with parallelization."""
-    results = {}
+def process_in_batches(df, llm, language_map, cache=None, on_row_complete=None, local_translator=None, local_cache=None,
+                       unit_texts=None):
+    """
+    Translate each unique (language, text) unit once and scatter the results back to the records
+    (`unit_texts` as in plan_translation_units).
+    Units routed to `local_translator` are translated first; the rest is streamed through one
+    long-lived pool and the LLMClient limiter bounds in-flight calls.
+    `on_row_complete(idx, translations)` is called as soon as every cell of a row is translated,
+    never for rows where a translation failed and fell back to the original text.
+    """
     new_records = df[df["status"] == "New"]
 
     if new_records.empty:
         logging.info("No new records to process.")
         return {}
 
-    total_records = len(new_records)
-    all_records = [(idx, row, row["language"]) for idx, row in new_records.iterrows()]
+    columns_to_translate = ["observation_final", "solution_final", "problem_cause_text"]
+    units, results = plan_translation_units(new_records, columns_to_translate, unit_texts)
+
+    all_units = list(units)
+    total_units = len(all_units)
+    total_cells = sum(len(cells) for cells in units.values())
+    dedup_ratio = total_cells / total_units if total_units else 1.0
+    logging.info(f"Planned {total_units} unique translation units for {total_cells} cells (dedup ratio {dedup_ratio:.2f}x)")
+    run_report.annotate(translation_units=total_units, translation_cells=total_cells, dedup_ratio=dedup_ratio)
+    route_counts = pd.Series(
+        [route for translations in results.values() for key, route in translations.items() if key.endswith("_translation_route")]
+    ).value_counts()
+    logging.info(f"Cells per translation route: {route_counts.to_dict()}")
+    run_report.annotate(translation_routes=route_counts.to_dict())
+
+    # Track outstanding cells per row so finished rows can be checkpointed early
+    remaining = {idx: 0 for idx in results}
+    for cells in units.values():
+        for idx, _ in cells:
+            remaining[idx] += 1
+    if on_row_complete is not None:
+        for idx, count in remaining.items():
+            if count == 0:
+                on_row_complete(idx, results[idx])
+
+    # Rows with a failed unit keep its original text but are not checkpointed, so the next run retries them
+    failed_rows = set()
+
+    def apply_translations(translated, route=None):
+        for unit, translation in translated:
+            if translation is None:
+                run_report.count("translation.fallback_to_original")
+            for idx, col in units[unit]:
+                if translation is None:
+                    # The cell's own text, not the unit's (a near-duplicate representative, whitespace-normalized)
+                    failed_rows.add(idx)
+                    results[idx][col] = str(new_records.at[idx, col.removesuffix("_translated")]).strip()
+                else:
+                    results[idx][col] = translation
+                if route is not None:
+                    results[idx][col.removesuffix("_translated") + "_translation_route"] = route
+                remaining[idx] -= 1
+                if remaining[idx] == 0 and on_row_complete is not None and idx not in failed_rows:
+                    on_row_complete(idx, results[idx])
+
+    def scatter(future, item):
+        try:
+            translated = future.result()
+        except TranslationBudgetExceeded:
+            # The rows of these units stay incomplete and are translated by the next run
+            return
+        except Exception as e:
+            logging.error(f"Translation failed for {len(item)} units: {e}")
+            translated = [(unit, None) for unit in item]
+        apply_translations(translated)
 
-    for i in range(0, total_records, batch_size):
-        batch = all_records[i: i + batch_size]
-        logging.info(f"Processing batch {i // batch_size + 1}/{(total_records + batch_size - 1) // batch_size}")
-        batch_start = datetime.datetime.now()
+    # Short unambiguous units go to the local backend; its rejects join the LLM units
+    local_units, all_units = split_local_units(all_units, local_translator)
+    if local_units:
+        with run_report.stage("translate_local", units=len(local_units)):
+            llm_cached, translated, escalated = translate_local(local_units, local_translator, cache, local_cache)
+        # Cached LLM translations keep the 'llm' route of their cells
+        apply_translations(llm_cached)
+        apply_translations(translated, route="local")
+        all_units += escalated
+        logging.info(f"Translated {len(translated)} units locally, {len(escalated)} escalated to the LLM")
+        run_report.count("translation.local_units", len(translated))
+        run_report.count("translation.local_escalations", len(escalated))
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_record = {executor.submit(translate_record, record, llm, language_map): record for record in batch}
+    if BATCH_TRANSLATION:
+        work_items = pack_segments(all_units, SEGMENT_TOKEN_BUDGET, MAX_SEGMENTS_PER_PROMPT)
+        logging.info(f"Packed {len(all_units)} units into {len(work_items)} prompts")
+    else:
+        work_items = [[unit] for unit in all_units]
 
-            for future in tqdm(concurrent.futures.as_completed(future_to_record), total=len(batch), desc=f"Batch {i // batch_size + 1}"):
-                try:
-                    idx, translations = future.result()
-                    results[idx] = translations
-                except Exception as e:
-                    record = future_to_record[future]
-                    logging.error(f"Batch translation failed for record {record[0]}: {e}")
+    run_report.annotate(prompts_planned=len(work_items))
 
-        logging.info(f"Batch {i // batch_size + 1} processed in {datetime.datetime.now() - batch_start}")
+    # Keep a bounded queue of submitted work so memory does not grow with the corpus
+    max_pending = MAX_WORKERS * 4
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+            tqdm(total=len(work_items), desc="Translating") as progress:
+        for item in work_items:
+            if llm.budget is not None and llm.budget.exceeded:
+                logging.warning("Translation budget reached, no further prompts are submitted")
+                break
+            if len(pending) >= max_pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    scatter(future, pending.pop(future))
+                    progress.update(1)
+            pending[executor.submit(translate_batch, item, llm, language_map, cache)] = item
+        for future in concurrent.futures.as_completed(list(pending)):
+            scatter(future, pending.pop(future))
+            progress.update(1)
 
+    if failed_rows:
+        logging.warning(f"{len(failed_rows)} rows keep an untranslated text and are retried by the next run")
+        run_report.count("rows.translation_failed", len(failed_rows))
     return results
 
+def completion_token_ratio(cache, language, sample_size):
+    """Translation/source token ratio measured on cached translations of a language, 1.0 without any."""
+    pairs = cache.sample(language, sample_size) if cache is not None else []
+    source_tokens = sum(count_tokens(source) for source, _ in pairs)
+    return sum(count_tokens(translation) for _, translation in pairs) / source_tokens if source_tokens else 1.0
+
+def measured_seconds_per_request():
+    """Wall seconds of the translate stage per LLM request in the latest run that made requests, or None."""
+    for report in iter_run_reports(run_report.run_name):
+        requests = report.get("metadata", {}).get("llm_stats", {}).get("requests", 0)
+        translate = next((stage for stage in report.get("stages", []) if stage["name"] == "translate"), None)
+        if requests and translate:
+            return translate["wall_seconds"] / requests
+    return None
+
+def plan_translation(df, language_map, cache=None, local_translator=None, unit_texts=None):
+    """
+    Dry run of process_in_batches on the new records: per language, the cells and unique units
+    left after the English/alphanumeric/empty skips, the units routed to the local backend, the
+    units already cached, and the prompts, prompt tokens and estimated completion tokens of the
+    LLM calls the run would make (before any local output is escalated to the LLM).
+    """
+    new_records = df[df["status"] == "New"]
+    units, _ = plan_translation_units(new_records, translation_columns, unit_texts)
+    local_units, llm_units = split_local_units(units, local_translator)
+    if BATCH_TRANSLATION:
+        work_items = pack_segments(llm_units, SEGMENT_TOKEN_BUDGET, MAX_SEGMENTS_PER_PROMPT)
+    else:
+        work_items = [[unit] for unit in llm_units]
+
+    plan, ratios = {}, {}
+    columns = ["cells", "units", "local_units", "cached_units", "prompts", "prompt_tokens", "completion_tokens_estimate"]
+    for unit in local_units:
+        stats = plan.setdefault(unit[0], dict.fromkeys(columns, 0))
+        stats["cells"] += len(units[unit])
+        stats["units"] += 1
+        stats["local_units"] += 1
+    for item in work_items:
+        language = item[0][0]
+        stats = plan.setdefault(language, dict.fromkeys(columns, 0))
+        stats["cells"] += sum(len(units[unit]) for unit in item)
+        stats["units"] += len(item)
+        # Same prompts as translate_batch/translate_text: cached units are not sent
+        pending = [unit for unit in item if cache is None or not cache.contains(*unit)]
+        stats["cached_units"] += len(item) - len(pending)
+        if not pending:
+            continue
+        lang_name = language_map.get(language, "Unknown")
+        if len(item) == 1:
+            prompt, source = build_translation_prompt(lang_name, pending[0][1]), pending[0][1]
+        else:
+            segments = [text for _, text in pending]
+            prompt, source = build_batch_translation_prompt(lang_name, segments), json.dumps(segments, ensure_ascii=False)
+        if language not in ratios:
+            ratios[language] = completion_token_ratio(cache, language, COMPLETION_RATIO_SAMPLE_SIZE)
+        stats["prompts"] += 1
+        stats["prompt_tokens"] += count_tokens(prompt)
+        stats["completion_tokens_estimate"] += round(count_tokens(source) * ratios[language])
+
+    # Declared columns keep an all-zero plan well-formed when nothing is left to translate
+    plan_df = pd.DataFrame.from_dict(plan, orient="index", columns=columns).astype("int64")
+    plan_df.insert(0, "rows", new_records["language"].astype(str).value_counts().reindex(plan_df.index, fill_value=0))
+    plan_df.index.name = "language"
+    return plan_df.sort_index()
+
 # --------------------------------------------------------------------------------
 # Constants for chunking and processing
-MAX_WORKERS = 4
-MAX_RETRIES = 1
+MAX_WORKERS = 16
+MAX_RETRIES = 5
+
+# Adaptive concurrency (AIMD) and backoff settings for LLM calls
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Bump PROMPT_VERSION whenever the translation prompt changes so cached translations are not reused
+PROMPT_VERSION = 1
+TRANSLATION_CACHE_PATH = "translation_cache.sqlite3"
+
+# Completed rows are flushed to the checkpoint every CHECKPOINT_FLUSH_ROWS rows
+TRANSLATION_CHECKPOINT_PATH = "translation_checkpoint.jsonl"
+CHECKPOINT_FLUSH_ROWS = 500
+
+# Route cells that only hold codes, numbers or English text past the LLM (see sts_pipeline.translation_need);
+# the decision for every cell is kept in the <column>_translation_route audit columns. Off until validated on
+# real labeled cells (benchmarks/bench_translation_need.py --labeled)
+FAST_PATH_CLASSIFIER = False
+
+# Pack several short segments of the same language into one prompt
+BATCH_TRANSLATION = True
+SEGMENT_TOKEN_BUDGET = 1500
+MAX_SEGMENTS_PER_PROMPT = 40
+
+# Local tokenizer (tiktoken encoding) of the LLM for prompt/completion token counts;
+# tokens are estimated from characters when tiktoken is not installed
+TOKENIZER_ENCODING = "cl100k_base"
+
+# Dry run: plan the calls, tokens and wall time the new records need, without calling the LLM or writing the output
+TRANSLATION_DRY_RUN = False
+# Wall time per request used by the plan when no previous run report measured it
+ASSUMED_SECONDS_PER_REQUEST = 1.0
+# Cached translations sampled per language to measure the completion/source token ratio
+COMPLETION_RATIO_SAMPLE_SIZE = 1000
+
+# Per-run LLM budget, None for no limit. Once it is reached no new call is made, completed rows are
+# checkpointed and the run stops without writing the output; the next run resumes from the checkpoint
+TRANSLATION_TOKEN_BUDGET = None
+TRANSLATION_REQUEST_BUDGET = None
+
+# Local machine translation (sts_pipeline.local_translation): "ctranslate2" for the int8 OPUS-MT models in
+# LOCAL_TRANSLATION_MODEL_DIR, "mock" for offline runs, None to send every unit to the LLM
+LOCAL_TRANSLATION_BACKEND = None
+LOCAL_TRANSLATION_MODEL_DIR = "opus_mt_ct2"
+LOCAL_TRANSLATION_THREADS = 4
+LOCAL_TRANSLATION_BATCH_SIZE = 64
+# Units with more words than this, several sentences or mixed scripts are left to the LLM
+LOCAL_TRANSLATION_MAX_WORDS = 24
 
 # Initialize LLM and language map
 LLM_ID = "openai:Lite_llm_STS_Dev_GPT_4O:gpt-35-turbo-16k"
 client = dataiku.api_client()
 project = client.get_default_project()
 llm = project.get_llm(LLM_ID)
+translation_stats = TranslationStats()
+llm_client = LLMClient(
+    llm,
+    AdaptiveLimiter(INITIAL_CONCURRENCY, MIN_CONCURRENCY, MAX_WORKERS),
+    translation_stats,
+    MAX_RETRIES,
+    BACKOFF_BASE_SECONDS,
+    BACKOFF_MAX_SECONDS,
+    budget=TranslationBudget(TRANSLATION_TOKEN_BUDGET, TRANSLATION_REQUEST_BUDGET),
+)
+translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, PROMPT_VERSION, LLM_ID)
+
+local_translator, local_translation_cache = None, None
+if LOCAL_TRANSLATION_BACKEND is not None:
+    local_translator = load_translator(
+        LOCAL_TRANSLATION_BACKEND, LOCAL_TRANSLATION_MODEL_DIR, LOCAL_TRANSLATION_THREADS, LOCAL_TRANSLATION_BATCH_SIZE
+    )
+    # Local translations are cached apart from the LLM ones, under the backend's model id
+    local_translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, "local", local_translator.model_id)
+    logging.info(f"Local translation backend {local_translator.model_id} for {sorted(local_translator.languages)}")
+    run_report.annotate(local_translation_backend=local_translator.model_id, local_translation_threads=LOCAL_TRANSLATION_THREADS)
 
 language_map = {
     "en": "English",
@@ -216,28 +958,126 @@ language_map = {
 # -------------------------------------------------------------------------------
 # Clean translation columns
 translation_columns = ["observation_final", "solution_final", "problem_cause_text"]
-sts_cmb_df = clean_columns(sts_cmb_df, translation_columns)
+with run_report.stage("clean_columns"):
+    sts_cmb_df = clean_columns(sts_cmb_df, translation_columns)
+
+# Reuse translations of rows whose source text is unchanged since the last output or a crashed run
+with run_report.stage("checkpoint_reuse"):
+    # Settings that change the translation of a row, besides the prompt version and the LLM
+    translation_settings = [
+        f"fast_path={FAST_PATH_CLASSIFIER}",
+        f"local={local_translator.model_id if local_translator is not None else None}:{LOCAL_TRANSLATION_MAX_WORDS}",
+    ]
+    sts_cmb_df["row_hash"] = compute_row_hashes(
+        sts_cmb_df, translation_columns, PROMPT_VERSION, LLM_ID, translation_settings, translation_unit_texts
+    )
+    checkpoint = TranslationCheckpoint(TRANSLATION_CHECKPOINT_PATH, CHECKPOINT_FLUSH_ROWS)
+    done_mask = sts_cmb_df["row_hash"].isin(checkpoint.records)
+    for column in translation_columns:
+        for output_column in [f"{column}_translated", f"{column}_translation_route"]:
+            sts_cmb_df[output_column] = ""
+            sts_cmb_df.loc[done_mask, output_column] = sts_cmb_df.loc[done_mask, "row_hash"].map(
+                {h: t.get(output_column, "") for h, t in checkpoint.records.items()}
+            )
+    sts_cmb_df["status"] = np.where(done_mask, "Processed", "New")
+logging.info(f"Reusing {int(done_mask.sum())} translated rows, {int((~done_mask).sum())} rows to translate")
+run_report.count("rows.reused_from_checkpoint", int(done_mask.sum()))
+run_report.count("rows.to_translate", int((~done_mask).sum()))
+
+def checkpoint_row(idx, translations):
+    checkpoint.add(sts_cmb_df.at[idx, "row_hash"], translations)
+
+# Dry run: report the planned work per language and stop before any LLM call
+if TRANSLATION_DRY_RUN:
+    with run_report.stage("plan"):
+        translation_plan = plan_translation(
+            sts_cmb_df, language_map, translation_cache, local_translator, translation_unit_texts
+        )
+    seconds_per_request = measured_seconds_per_request()
+    if seconds_per_request is None:
+        logging.info(f"No measured throughput in previous run reports, assuming {ASSUMED_SECONDS_PER_REQUEST}s per request")
+        seconds_per_request = ASSUMED_SECONDS_PER_REQUEST
+    if translation_plan.empty:
+        logging.info("Nothing to translate: every new cell is reused from the checkpoint or resolved without the LLM")
+    totals = translation_plan.sum()
+    planned_tokens = int(totals["prompt_tokens"] + totals["completion_tokens_estimate"])
+    projected_seconds = totals["prompts"] * seconds_per_request
+    logging.info(f"Translation plan per language:\n{translation_plan.to_string()}")
+    logging.info(
+        f"Planned {int(totals['prompts'])} LLM calls, {planned_tokens} tokens, about {projected_seconds / 60:.1f} minutes "
+        f"({planned_tokens / max(projected_seconds / 60, 1e-9):.0f} tokens/minute)"
+    )
+    if TRANSLATION_TOKEN_BUDGET is not None and planned_tokens > TRANSLATION_TOKEN_BUDGET:
+        logging.warning(f"The plan needs more than the token budget of {TRANSLATION_TOKEN_BUDGET}")
+    if TRANSLATION_REQUEST_BUDGET is not None and totals["prompts"] > TRANSLATION_REQUEST_BUDGET:
+        logging.warning(f"The plan needs more than the request budget of {TRANSLATION_REQUEST_BUDGET}")
+    run_report.annotate(
+        translation_plan=translation_plan.reset_index().to_dict(orient="records"),
+        planned_tokens=planned_tokens,
+        seconds_per_request=seconds_per_request,
+        projected_seconds=float(projected_seconds),
+    )
+    translation_cache.close()
+    if local_translation_cache is not None:
+        local_translation_cache.close()
+    run_report.write()
+
+else:
+    # Process translations in batches
+    start_time = datetime.datetime.now()
+    try:
+        with run_report.stage("translate"):
+            translation_results = process_in_batches(
+                sts_cmb_df, llm_client, language_map, cache=translation_cache, on_row_complete=checkpoint_row,
+                local_translator=local_translator, local_cache=local_translation_cache,
+                unit_texts=translation_unit_texts,
+            )
+    finally:
+        checkpoint.flush()
+    logging.info(f"LLM stats: {translation_stats.summary()}")
+    logging.info(f"Translation cache: {translation_cache.hits} hits, {translation_cache.misses} misses")
+    run_report.annotate(llm_stats=translation_stats.summary(), translation_budget=llm_client.budget.summary())
+    run_report.count("translation_cache.hits", translation_cache.hits)
+    run_report.count("translation_cache.misses", translation_cache.misses)
+    translation_cache.close()
+    if local_translation_cache is not None:
+        logging.info(f"Local translation cache: {local_translation_cache.hits} hits, {local_translation_cache.misses} misses")
+        run_report.count("local_translation_cache.hits", local_translation_cache.hits)
+        run_report.count("local_translation_cache.misses", local_translation_cache.misses)
+        local_translation_cache.close()
 
-# Add default values
-sts_cmb_df["status"] = "New"
+    # Budget reached: completed rows are in the checkpoint, the output is left as it was
+    if llm_client.budget.exceeded:
+        rows_completed = sum(
+            all(f"{column}_translated" in translations for column in translation_columns)
+            for translations in translation_results.values()
+        )
+        rows_left = int((sts_cmb_df["status"] == "New").sum()) - rows_completed
+        run_report.count("rows.left_by_budget", rows_left)
+        run_report.write()
+        raise TranslationBudgetExceeded(
+            f"Translation budget reached after {llm_client.budget.requests} requests and {llm_client.budget.tokens} tokens: "
+            f"{rows_completed} rows checkpointed, {rows_left} rows left. Run the recipe again to resume from the checkpoint."
+        )
 
-# Process translations in batches
-start_time = datetime.datetime.now()
-translation_results = process_in_batches(sts_cmb_df, llm, language_map)
+    # Update DataFrame with translations
+    with run_report.stage("apply_results", rows_in=len(translation_results)):
+        for idx, translations in translation_results.items():
+            for col, value in translations.items():
+                sts_cmb_df.at[idx, col] = value
 
-# Update DataFrame with translations
-for idx, translations in translation_results.items():
-    for col, value in translations.items():
-        sts_cmb_df.at[idx, col] = value
+    # Mark processed records
+    sts_cmb_df.loc[sts_cmb_df["status"] == "New", "status"] = "Processed"
 
-# Mark processed records
-sts_cmb_df.loc[sts_cmb_df["status"] == "New", "status"] = "Processed"
+    # Log total processing time
+    end_time = datetime.datetime.now()
+    logging.info(f"Total processing time: {end_time - start_time}")
 
-# Log total processing time
-end_time = datetime.datetime.now()
-logging.info(f"Total processing time: {end_time - start_time}")
+    # Write translated records to output dataset
+    translated_df = sts_cmb_df[sts_cmb_df["status"] == "Processed"]
+    with run_report.stage("write", rows_in=len(translated_df)):
+        storage.write("sts_cmb_trns", translated_df, partition_cols=PARTITION_COLUMNS)
 
-# Write translated records to output dataset
-translated_df = sts_cmb_df[sts_cmb_df["status"] == "Processed"]
-sts_cmb_trns = dataiku.Dataset("sts_cmb_trns")
-sts_cmb_trns.write_with_schema(translated_df)
+    # The checkpoint now mirrors the successful output and seeds the next incremental run
+    checkpoint.compact(translated_df["row_hash"].unique())
+    run_report.write()
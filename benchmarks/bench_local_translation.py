@@ -0,0 +1,59 @@
+"""
+Benchmark the local translation backend of sts_pipeline.local_translation: segments per second
+on synthetic STS texts for several thread counts and batch sizes, batched by language and
+length as in 02_translation.py, with the share of segments the routing policy keeps local and
+the share of outputs escalated to the LLM. Use --backend mock to check the plumbing offline.
+
+    python benchmarks/bench_local_translation.py --model-dir opus_mt_ct2 --threads 1 2 4 --batch-sizes 16 64
+"""
+import os
+import sys
+import time
+import argparse
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_sts import text_pool
+from sts_pipeline.local_translation import is_suspect_translation, length_batches, load_translator, route_to_local
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", default="ctranslate2", help="ctranslate2 or mock")
+    parser.add_argument("--model-dir", default="opus_mt_ct2", help="directory of the converted <language>-en models")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--texts", type=int, default=500, help="texts per language")
+    parser.add_argument("--max-words", type=int, default=24)
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        for batch_size in args.batch_sizes:
+            translator = load_translator(args.backend, args.model_dir, threads, batch_size)
+            units = [
+                (language, text)
+                for language in sorted(translator.languages)
+                for kind in ["observation", "solution"]
+                for text in text_pool(language, args.texts // 2, kind)
+            ]
+            local_units = [unit for unit in units if route_to_local(*unit, translator.languages, args.max_words)]
+            # Load every model before timing
+            for language in translator.languages:
+                translator.translate(language, ["test"])
+
+            escalated = 0
+            start = time.perf_counter()
+            for language in sorted(translator.languages):
+                texts = [text for unit_language, text in local_units if unit_language == language]
+                for batch in length_batches(texts, batch_size):
+                    sources = [texts[i] for i in batch]
+                    outputs = translator.translate(language, sources)
+                    escalated += sum(is_suspect_translation(source, output) for source, output in zip(sources, outputs))
+            elapsed = time.perf_counter() - start
+            print(
+                f"threads {threads:>2}, batch {batch_size:>3}: {len(local_units) / elapsed:8.1f} segments/s, "
+                f"{len(local_units)}/{len(units)} routed local, {escalated} escalated"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the IVF retrieval index of sts_pipeline.retrieval against exact (brute-force) search
+on synthetic clustered unit vectors with project/language/subsystem metadata: build and save
+time, then recall@k and query latency (batched, and one query at a time) for several nprobe
+values, without and with a metadata filter.
+
+    python benchmarks/bench_retrieval.py --sizes 100k 1m --nprobe 4 8 16 32
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+from run_benchmarks import parse_size
+from sts_pipeline.retrieval import IVFIndex, normalize_queries
+
+PROJECTS = [f"project_{i}" for i in range(20)]
+LANGUAGES = ["en", "fr", "es", "it", "sv", "ru", "kk"]
+SUBSYSTEMS = [f"subsystem_{i}" for i in range(50)]
+
+def make_corpus(count, dim, seed=0, latent_dim=24, topics=1000):
+    """
+    Unit vectors with a low intrinsic dimension like sentence embeddings: overlapping Gaussian
+    topics in a `latent_dim` space, randomly projected to `dim` dimensions; random metadata.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, latent_dim)).astype(np.float32)
+    projection = rng.standard_normal((latent_dim, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        size = min(100_000, count - start)
+        latent = centres[rng.integers(0, topics, size)] + rng.standard_normal((size, latent_dim)).astype(np.float32) * 0.7
+        vectors[start:start + size] = normalize_queries(latent @ projection)
+    metadata = pd.DataFrame({
+        "project": np.array(PROJECTS)[rng.integers(0, len(PROJECTS), count)],
+        "language": np.array(LANGUAGES)[rng.integers(0, len(LANGUAGES), count)],
+        "subsystem": np.array(SUBSYSTEMS)[rng.integers(0, len(SUBSYSTEMS), count)],
+    })
+    return vectors, metadata
+
+def exact_search(vectors, queries, k, mask=None):
+    """Brute-force top-k labels (row numbers) of each query."""
+    rows = np.flatnonzero(mask) if mask is not None else np.arange(len(vectors))
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_labels = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(rows), 200_000):
+        block = rows[start:start + 200_000]
+        scores = np.concatenate([best_scores, queries @ vectors[block].T], axis=1)
+        labels = np.concatenate([best_labels, np.broadcast_to(block, (len(queries), len(block)))], axis=1)
+        top = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+        best_scores, best_labels = np.take_along_axis(scores, top, 1), np.take_along_axis(labels, top, 1)
+    return best_labels
+
+def recall(found, truth):
+    return np.mean([len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+def time_queries(index, queries, k, nprobe, filters):
+    """(ms per query in one batch, p50 and p95 ms of single queries, batch labels)."""
+    start = time.perf_counter()
+    _, labels = index.search(queries, k, nprobe=nprobe, filters=filters)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    single = []
+    for query in queries[:100]:
+        start = time.perf_counter()
+        index.search(query, k, nprobe=nprobe, filters=filters)
+        single.append((time.perf_counter() - start) * 1000)
+    return batch_ms, np.percentile(single, 50), np.percentile(single, 95), labels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1m"], help="indexed vectors, e.g. 100k 1m")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    filters = {"project": PROJECTS[0], "language": ["fr", "es"]}
+    for size in map(parse_size, args.sizes):
+        vectors, metadata = make_corpus(size, args.dim, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = normalize_queries(vectors[rng.choice(size, args.queries, replace=False)]
+                                    + rng.standard_normal((args.queries, args.dim)).astype(np.float32) * 0.03)
+
+        index_dir = tempfile.mkdtemp(prefix="sts_ivf_")
+        try:
+            start = time.perf_counter()
+            index = IVFIndex.train(vectors, seed=args.seed)
+            trained = time.perf_counter() - start
+            index.add(np.arange(size), vectors, metadata)
+            index.save(index_dir)
+            built = time.perf_counter() - start
+            index = IVFIndex.load(index_dir)
+            print(f"{size} vectors, nlist {index.nlist}: trained in {trained:.1f}s, built and saved in {built:.1f}s")
+
+            mask = (metadata["project"] == filters["project"]) & metadata["language"].isin(filters["language"])
+            for label, query_filters, truth_mask in [("no filter", None, None), (f"filter ({int(mask.sum())} items)", filters, mask.to_numpy())]:
+                start = time.perf_counter()
+                truth = exact_search(vectors, queries, args.k, truth_mask)
+                exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+                print(f"  {label}: exact search {exact_ms:.2f} ms/query")
+                for nprobe in args.nprobe:
+                    batch_ms, p50, p95, labels = time_queries(index, queries, args.k, nprobe, query_filters)
+                    print(
+                        f"    nprobe {nprobe:>3}: recall@{args.k} {recall(labels, truth):.3f}, "
+                        f"batched {batch_ms:.2f} ms/query, single p50 {p50:.2f} ms, p95 {p95:.2f} ms"
+                    )
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
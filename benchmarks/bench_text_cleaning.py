@@ -0,0 +1,72 @@
+"""
+Benchmark the process-pool text cleaning against the serial one at several worker counts:
+the language cleaning of 01_preprocessing.py (clean_unique_texts per language) and the
+clean_translated_text of 03_cleaning_post_translation, on synthetic unique texts. Every
+parallel output is checked to be identical to the serial output.
+
+    python benchmarks/bench_text_cleaning.py --texts 200000 --workers 1 2 4 8 16
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+from sts_pipeline.parallel import ParallelTextMapper
+from sts_pipeline.text_cleaning import clean_translated_texts, clean_unique_texts
+from synthetic_sts import VOCABULARY, text_pool
+
+def make_texts(count, seed=0):
+    """{language code: unique raw texts}, with repeated words/symbols for the stage-3 patterns."""
+    rng = np.random.default_rng(seed)
+    per_language = count // len(VOCABULARY)
+    texts = {}
+    for language in VOCABULARY:
+        pool = text_pool(language, per_language, "observation")
+        noise = np.array(["", " ✓", " -- ##", " N/A", "  ok ok", " ★★"], dtype=object)[rng.integers(0, 6, per_language)]
+        texts[language] = np.array([f"{text}{suffix} #{i}" for i, (text, suffix) in enumerate(zip(pool, noise))], dtype=object)
+    return texts
+
+def clean_languages(mapper, texts):
+    """Clean every language like clean_text_column of 01_preprocessing.py, submitting them all first."""
+    pending = {language: mapper.submit(clean_unique_texts, values, language) for language, values in texts.items()}
+    return {language: mapper.gather(result) for language, result in pending.items()}
+
+def clean_translated(mapper, texts):
+    return mapper.map(clean_translated_texts, np.concatenate(list(texts.values())))
+
+def time_run(function, mapper, texts):
+    start = time.perf_counter()
+    result = function(mapper, texts)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=200_000, help="unique texts, spread over the languages")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    print(f"unique texts: {sum(len(values) for values in texts.values())}, CPUs: {os.cpu_count()}")
+    for label, function in [("01 language cleaning", clean_languages), ("03 clean_translated_text", clean_translated)]:
+        serial_seconds, serial = time_run(function, ParallelTextMapper(1), texts)
+        print(f"{label}\n  serial:     {serial_seconds:.2f}s")
+        for workers in args.workers:
+            with ParallelTextMapper(workers) as mapper:
+                # Start the pool outside the timing, as it is reused across columns and chunks
+                mapper.map(clean_translated_texts, np.array(["warm up"] * mapper.min_shard_texts * workers * 2, dtype=object))
+                seconds, result = time_run(function, mapper, texts)
+            if isinstance(serial, dict):
+                identical = all(np.array_equal(serial[language], result[language]) for language in serial)
+            else:
+                identical = np.array_equal(serial, result)
+            if not identical:
+                raise AssertionError(f"{label}: output with {workers} workers differs from the serial output")
+            print(f"  {workers:>2} workers: {seconds:.2f}s ({serial_seconds / seconds:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the fast-path translation-need classifier of sts_pipeline.translation_need on a
+labeled sample of non-English cells: confusion matrix against the label, false skips (texts
+that needed a translation but were routed past the LLM) and LLM calls avoided compared with
+the previous rule, which only skipped strict [A-Za-z0-9]+ tokens.
+
+The default sample is fixtures/translation_need_labeled.csv, hand-labeled maintenance phrases
+(abbreviations, false friends, English and codes recorded under other languages) that are
+not drawn from the synthetic vocabulary; --labeled reads another CSV with language, text and
+needs_translation columns. --synthetic builds a sample from the synthetic STS vocabulary
+instead, which the word lists partly share: use it for call volumes, not for false skips.
+
+    python benchmarks/bench_translation_need.py
+    python benchmarks/bench_translation_need.py --labeled labeled_cells.csv
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_sts import VOCABULARY, text_pool
+from sts_pipeline.translation_need import classify_translation_need, load_english_lexicon
+
+SOURCE_LANGUAGES = ["fr", "es", "it", "sv", "ru", "kk"]
+LABELED_FIXTURE = os.path.join(BENCHMARKS_DIR, "fixtures", "translation_need_labeled.csv")
+
+# Cells that need no translation in any language
+CODE_TEXTS = [
+    "P/N 1234-AB OK", "OC-04", "PC-012", "SC-01", "12.5 mm", "TCMS 3.2.1", "N/A - N/A", "750 V DC", "S/N 00042-X",
+    "HVAC #2", "1500 rpm", "REF 88-1200/3", "25 °C", "CCTV cam 3", "---", "12/03/2021",
+]
+
+def labeled_sample(pool_size=150, seed=0):
+    """(language, text, needs_translation) rows of the synthetic sample."""
+    rng = np.random.default_rng(seed)
+    english_components, english_faults, english_actions, _ = VOCABULARY["en"]
+    rows = []
+    for language in SOURCE_LANGUAGES:
+        components, faults, actions, _ = VOCABULARY[language]
+        for kind in ["observation", "solution"]:
+            rows += [(language, text, True) for text in text_pool(language, pool_size, kind)]
+            rows += [(language, text, False) for text in text_pool("en", pool_size // 3, kind)]
+        rows += [(language, text, False) for text in CODE_TEXTS]
+        # Category codes joined with a text, as in observation_final
+        rows += [(language, f"OC-{i:02d}-{components[i % len(components)]} {faults[i % len(faults)]}", True) for i in range(10)]
+        rows += [(language, f"OC-{i:02d}-{english_components[i % 8]} {english_faults[i % 6]}", False) for i in range(10)]
+        # Source-language component with an English fault: still needs a translation
+        rows += [
+            (language, f"{components[i]} {english_faults[j]}", True)
+            for i, j in zip(rng.integers(0, len(components), 10), rng.integers(0, len(english_faults), 10))
+        ]
+        rows += [(language, f"{english_components[i]} {actions[i % len(actions)]}", True) for i in range(len(actions))]
+    return pd.DataFrame(rows, columns=["language", "text", "needs_translation"])
+
+def previous_rule_skips(text):
+    """Skip decision of the previous rule for a non-empty non-English cell."""
+    return re.fullmatch(r"[A-Za-z0-9]+", text.strip()) is not None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labeled", default=LABELED_FIXTURE, help="CSV with language, text and needs_translation columns")
+    parser.add_argument("--synthetic", action="store_true", help="use the synthetic vocabulary sample instead")
+    parser.add_argument("--pool-size", type=int, default=150, help="source-language texts per language and kind")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        sample = labeled_sample(args.pool_size)
+    else:
+        sample = pd.read_csv(args.labeled, keep_default_na=False)
+        sample["needs_translation"] = sample["needs_translation"].astype(str).str.lower().isin(["1", "true", "yes"])
+    sample = sample[(sample["text"].str.strip() != "") & (sample["language"] != "en")].reset_index(drop=True)
+
+    start = time.perf_counter()
+    load_english_lexicon()
+    lexicon_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    routes = [classify_translation_need(text.strip(), language) for language, text in zip(sample["language"], sample["text"])]
+    elapsed = time.perf_counter() - start
+    sample["route"] = pd.Series(routes, dtype=object).fillna("llm")
+    sample["skipped"] = sample["route"] != "llm"
+    sample["previous_skipped"] = [previous_rule_skips(text) for text in sample["text"]]
+
+    print(f"cells:      {len(sample)} ({int(sample['needs_translation'].sum())} need a translation)")
+    print(f"classifier: {elapsed * 1e6 / len(sample):.1f} us/cell, after loading the lexicon in {lexicon_seconds:.1f}s")
+    print()
+    print(pd.crosstab(sample["needs_translation"], sample["route"], margins=True).to_string())
+    print()
+    for label, skipped in [("previous rule", sample["previous_skipped"]), ("classifier", sample["skipped"])]:
+        false_skips = int((skipped & sample["needs_translation"]).sum())
+        missed_skips = int((~skipped & ~sample["needs_translation"]).sum())
+        # LLM calls: one per distinct (language, text) left to the LLM, as in plan_translation_units
+        calls = len(sample.loc[~skipped, ["language", "text"]].drop_duplicates())
+        print(f"{label:<14} LLM calls {calls:>5}, false skips {false_skips:>3}, texts needing no translation sent {missed_skips:>4}")
+    previous_calls = len(sample.loc[~sample["previous_skipped"], ["language", "text"]].drop_duplicates())
+    calls = len(sample.loc[~sample["skipped"], ["language", "text"]].drop_duplicates())
+    print(f"avoided:       {previous_calls - calls} calls ({(previous_calls - calls) / previous_calls:.1%})")
+
+    false_skips = sample[sample["skipped"] & sample["needs_translation"]]
+    if len(false_skips):
+        print("\nfalse skips:")
+        print(false_skips[["language", "text", "route"]].head(20).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Deterministic stand-in for the Dataiku LLM Mesh used by 02_translation.py.
+
+Answers the single-text and JSON-array translation prompts with "[en] <text>", after a
+configurable latency, and fails a configurable fraction of calls with a throttling
+response. Latency jitter and failures are derived from a hash of the prompt and its
+attempt number, so a run is reproducible regardless of thread scheduling.
+"""
+import re
+import sys
+import json
+import time
+import types
+import hashlib
+import threading
+
+SINGLE_PROMPT_PATTERN = re.compile(r"Translate this input: '(.*)'\s*$", re.DOTALL)
+BATCH_PROMPT_PATTERN = re.compile(r"Translate this input: (\[.*\])\s*$", re.DOTALL)
+THROTTLED_RESPONSE = "429 Too Many Requests: rate limit exceeded"
+
+def mock_translate(text):
+    return f"[en] {text}" if text else ""
+
+class MockResponse:
+    def __init__(self, success, text):
+        self.success = success
+        self.text = text
+
+class MockCompletion:
+    def __init__(self, llm):
+        self._llm = llm
+        self._message = ""
+
+    def with_message(self, message):
+        self._message = message
+
+    def execute(self):
+        return self._llm.respond(self._message)
+
+class MockLLM:
+    """LLM handle with `new_completion()`, like dataiku's project.get_llm(...)."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def new_completion(self):
+        return MockCompletion(self)
+
+    def _draws(self, message):
+        """Two uniform numbers in [0, 1) for the latency jitter and the failure, fixed per prompt attempt."""
+        digest = hashlib.sha256(message.encode("utf-8")).hexdigest()
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        draw = hashlib.sha256(f"{self.seed}:{digest}:{attempt}".encode("utf-8")).digest()
+        return int.from_bytes(draw[:8], "big") / 2 ** 64, int.from_bytes(draw[8:16], "big") / 2 ** 64
+
+    def respond(self, message):
+        jitter_draw, failure_draw = self._draws(message)
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.jitter * jitter_draw)
+        if failure_draw < self.error_rate:
+            return MockResponse(False, THROTTLED_RESPONSE)
+
+        batch = BATCH_PROMPT_PATTERN.search(message)
+        if batch:
+            return MockResponse(True, json.dumps([mock_translate(text) for text in json.loads(batch.group(1))], ensure_ascii=False))
+        single = SINGLE_PROMPT_PATTERN.search(message)
+        return MockResponse(True, mock_translate(single.group(1) if single else ""))
+
+def install_mock_dataiku(llm):
+    """
+    Register a minimal `dataiku` module whose default project returns `llm` from get_llm().
+    Datasets are not mocked: run the recipes with STS_LOCAL_DATA_DIR set.
+    """
+    project = types.SimpleNamespace(get_llm=lambda llm_id: llm)
+    client = types.SimpleNamespace(get_default_project=lambda: project)
+    module = types.ModuleType("dataiku")
+    module.api_client = lambda: client
+    sys.modules["dataiku"] = module
+    return module
@@ -0,0 +1,178 @@
+"""
+Time every stage of the four recipes on synthetic STS data of increasing size.
+
+For each size, synthetic sources are generated, then 01 to 04 run one after the other in
+fresh processes with the mock LLM. Stage wall times, throughput (recipe input rows per
+second) and peak RSS come from the run reports and are appended to a JSON-lines results
+file, tagged with the git commit. With --compare-to, stages slower than that commit's
+results by more than --max-slowdown are reported and the exit code is 1.
+
+    python benchmarks/run_benchmarks.py --sizes 10k 100k --llm-latency 0.05
+    python benchmarks/run_benchmarks.py --sizes 1m --compare-to 4066421
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_sts import generate_sources
+
+RECIPES = {
+    "01": "01_preprocessing.py",
+    "02": "02_translation.py",
+    "03": "03_cleaning_post_translation",
+    "04": "04_translation_evaluation",
+}
+DEFAULT_SIZES = ["10k", "100k", "1m", "10m"]
+DEFAULT_RESULTS_PATH = os.path.join(BENCHMARKS_DIR, "results.jsonl")
+
+# Stages faster than this are too noisy to flag as regressions
+REGRESSION_MIN_SECONDS = 0.1
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000, '2500' -> 2500."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_recipe(recipe, work_dir, args):
+    """Run one recipe in a fresh process; return its run report, or None if it failed."""
+    reports_dir = os.path.join(work_dir, "reports", recipe)
+    env = dict(os.environ, STS_LOCAL_DATA_DIR=os.path.join(work_dir, "data"), STS_RUN_REPORT_DIR=reports_dir)
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, "run_recipe.py"), os.path.join(REPO_DIR, RECIPES[recipe]),
+        "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter),
+        "--llm-error-rate", str(args.llm_error_rate), "--seed", str(args.seed),
+    ]
+    with open(os.path.join(work_dir, f"{recipe}.log"), "w") as log:
+        result = subprocess.run(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if result.returncode:
+        print(f"  {recipe} failed with exit code {result.returncode}, see {log.name}")
+        return None
+    with open(sorted(glob.glob(os.path.join(reports_dir, "*.json")))[-1]) as f:
+        return json.load(f)
+
+def report_records(report, size, recipe, input_rows, common):
+    """One results record per stage, plus a 'total' record for the whole recipe."""
+    def record(stage, wall_seconds, peak_rss_bytes, **extra):
+        return {
+            **common, "rows": size, "recipe": recipe, "stage": stage, "wall_seconds": wall_seconds,
+            "rows_per_second": input_rows / wall_seconds if wall_seconds else None,
+            "peak_rss_bytes": peak_rss_bytes, **extra,
+        }
+
+    records = [record(stage["name"], stage["wall_seconds"], stage["peak_rss_bytes"]) for stage in report["stages"]]
+    records.append(record("total", report["wall_seconds"], report["peak_rss_bytes"], counters=report["counters"]))
+    return records
+
+def load_baseline(results_path, baseline_commit):
+    """Wall seconds per (rows, recipe, stage) of the latest results recorded for `baseline_commit`."""
+    baseline = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                previous = json.loads(line)
+                if previous.get("commit") == baseline_commit:
+                    baseline[(previous["rows"], previous["recipe"], previous["stage"])] = previous["wall_seconds"]
+    return baseline
+
+def find_regressions(records, baseline, max_slowdown):
+    """(recipe, stage, rows, baseline seconds, current seconds) of stages slower than the baseline allows."""
+    regressions = []
+    for record in records:
+        reference = baseline.get((record["rows"], record["recipe"], record["stage"]))
+        if reference is None or record["wall_seconds"] < REGRESSION_MIN_SECONDS:
+            continue
+        if record["wall_seconds"] > reference * max_slowdown:
+            regressions.append((record["recipe"], record["stage"], record["rows"], reference, record["wall_seconds"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="total source rows, e.g. 10k 100k 1m 10m")
+    parser.add_argument("--recipes", nargs="+", default=list(RECIPES), choices=list(RECIPES),
+                        help="recipes to run, in order; each one reads the outputs of the previous ones")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="JSON-lines results file (appended)")
+    parser.add_argument("--work-dir", help="where data and outputs are written (default: a temporary directory)")
+    parser.add_argument("--keep-data", action="store_true", help="keep the generated data and outputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique-ratio", type=float, default=0.05, help="distinct texts per row of a source language")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per mock LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random seconds per call, up to this value")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of calls answered with a 429")
+    parser.add_argument("--compare-to", help="commit whose results are the regression baseline")
+    parser.add_argument("--max-slowdown", type=float, default=1.2, help="allowed wall-time ratio to the baseline")
+    args = parser.parse_args()
+
+    common = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "seed": args.seed,
+        "unique_ratio": args.unique_ratio,
+        "llm_latency": args.llm_latency,
+        "llm_jitter": args.llm_jitter,
+        "llm_error_rate": args.llm_error_rate,
+    }
+    # Read the baseline before this run appends its own results
+    baseline = load_baseline(args.output, args.compare_to) if args.compare_to else {}
+    base_dir = args.work_dir or tempfile.mkdtemp(prefix="sts_bench_")
+    all_records = []
+    for size in map(parse_size, args.sizes):
+        work_dir = os.path.join(base_dir, str(size))
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+
+        start = time.perf_counter()
+        generate_sources(os.path.join(work_dir, "data"), size, seed=args.seed, unique_ratio=args.unique_ratio)
+        print(f"{size} rows: generated sources in {time.perf_counter() - start:.1f}s")
+
+        for recipe in args.recipes:
+            report = run_recipe(recipe, work_dir, args)
+            if report is None:
+                # Later recipes read the outputs of this one
+                break
+            read_stage = next((stage for stage in report["stages"] if stage["name"] == "read"), None)
+            input_rows = read_stage["rows_out"] if read_stage else size
+            records = report_records(report, size, recipe, input_rows, common)
+            all_records.extend(records)
+            with open(args.output, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            total = records[-1]
+            print(
+                f"  {recipe}: {total['wall_seconds']:.1f}s, {total['rows_per_second'] or 0:,.0f} rows/s, "
+                f"peak RSS {total['peak_rss_bytes'] / 2 ** 20:,.0f} MiB"
+            )
+
+        if not args.keep_data:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"Results appended to {args.output}")
+
+    if args.compare_to:
+        regressions = find_regressions(all_records, baseline, args.max_slowdown)
+        for recipe, stage, rows, reference, current in regressions:
+            print(f"REGRESSION {recipe} '{stage}' at {rows} rows: {reference:.2f}s -> {current:.2f}s")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Run one recipe script outside Dataiku, on local data and with the deterministic mock LLM.
+
+    STS_LOCAL_DATA_DIR=/tmp/sts_bench/data python benchmarks/run_recipe.py 02_translation.py --llm-latency 0.2
+"""
+import os
+import sys
+import runpy
+import argparse
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+from mock_llm import MockLLM, install_mock_dataiku
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recipe", help="recipe script, e.g. 01_preprocessing.py")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per mock LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random seconds per call, up to this value")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of calls answered with a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not os.environ.get("STS_LOCAL_DATA_DIR"):
+        parser.error("set STS_LOCAL_DATA_DIR to the directory holding the recipe inputs")
+    install_mock_dataiku(MockLLM(args.llm_latency, args.llm_jitter, args.llm_error_rate, args.seed))
+
+    # The recipes import sts_pipeline from the project library, i.e. the repository root
+    recipe = args.recipe if os.path.exists(args.recipe) else os.path.join(REPO_DIR, args.recipe)
+    sys.path.insert(0, REPO_DIR)
+    sys.argv = [recipe]
+    runpy.run_path(recipe, run_name="__main__")
+
+if __name__ == "__main__":
+    main()
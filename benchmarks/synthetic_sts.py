@@ -0,0 +1,193 @@
+"""
+Synthetic multilingual STS maintenance records for the benchmarks.
+
+Writes one <name>.parquet file per source of 01_preprocessing.dataset_names, with the
+source column layout, the project/language/database variants the standardization steps
+handle, Zipf-distributed (heavily duplicated) texts and the placeholders matched by
+INVALID_PATTERNS. The output is fully determined by the row count and the seed.
+
+    python benchmarks/synthetic_sts.py --rows 100000 --output /tmp/sts_bench/data
+"""
+import os
+import argparse
+
+import numpy as np
+
+# Same order as dataset_names in 01_preprocessing.py
+DATASET_NAMES = [
+    "LMRC", "sts_chile_ns16", "sts_dubai", "sts_222_emr", "sts_india",
+    "sts_italy", "sts_itac_nantes", "sts_kz8a", "sts_kz4at", "sts_rem",
+    "sts_panama", "sts_net2", "sts_spain", "sts_reg2n", "sts_tib",
+    "sts_xtrapolis_chile", "sts_vline_rrsmc", "sts_u400_Lyon", "sts_u400"
+]
+
+# Per source: raw project values and raw language values, including the spelling variants
+# standardize_values/standardize_language map (None exercises the mode fill)
+SOURCE_VARIANTS = {
+    "LMRC": (["LMRC"], ["ENGLISH", "English"]),
+    "sts_chile_ns16": (["NS16"], ["Spanish"]),
+    "sts_dubai": (["Dubai"], ["English", "ENGLISH"]),
+    "sts_222_emr": (["EMR 222", None], ["English"]),
+    "sts_india": (["IND_E_Loco"], ["English"]),
+    "sts_italy": (["Italy"], ["Italian"]),
+    "sts_itac_nantes": (["iTAC-Nantes"], ["French"]),
+    "sts_kz8a": (["KZ8A"], ["RUS", "Russian", "kazakh"]),
+    "sts_kz4at": (["KZ4AT"], ["kazakh", "Kazakh", "RUS"]),
+    "sts_rem": (["REM"], ["Spanish"]),
+    "sts_panama": (["Panama"], ["Spanish"]),
+    "sts_net2": (["NET2"], ["French", "English"]),
+    "sts_spain": (["Spain"], ["Spanish"]),
+    "sts_reg2n": (["REG2N"], ["French"]),
+    "sts_tib": (["TIB"], ["SWEDISH", "Swedish"]),
+    "sts_xtrapolis_chile": (["MERVAL", "merval", "Merval"], ["Spanish"]),
+    "sts_vline_rrsmc": (["VLINE RRSMC"], ["English"]),
+    "sts_u400_Lyon": (["U400 - Lyon"], ["French"]),
+    "sts_u400": (["U400"], ["ENGLISH", "SPANISH"]),
+}
+
+# Raw language value -> phrase vocabulary used for its texts
+VOCABULARY_LANGUAGE = {
+    "english": "en", "french": "fr", "italian": "it", "kazakh": "kk",
+    "russian": "ru", "rus": "ru", "spanish": "es", "swedish": "sv",
+}
+
+# (components, faults, actions, word for the car/vehicle number) per language
+VOCABULARY = {
+    "en": (["door", "pantograph", "brake", "air conditioning", "compressor", "traction motor", "display", "sensor"],
+           ["blocked", "faulty", "air leak", "abnormal noise", "intermittent fault", "out of service"],
+           ["replaced", "adjusted", "cleaned", "reset", "checked OK", "tightened"], "car"),
+    "fr": (["porte", "pantographe", "frein", "climatisation", "compresseur", "moteur de traction", "écran", "capteur"],
+           ["bloquée", "en panne", "fuite d'air", "bruit anormal", "défaut intermittent", "hors service"],
+           ["remplacé", "réglé", "nettoyé", "réinitialisé", "vérifié OK", "resserré"], "voiture"),
+    "es": (["puerta", "pantógrafo", "freno", "climatización", "compresor", "motor de tracción", "pantalla", "sensor"],
+           ["bloqueada", "averiada", "fuga de aire", "ruido anormal", "fallo intermitente", "fuera de servicio"],
+           ["sustituido", "ajustado", "limpiado", "reiniciado", "revisado OK", "apretado"], "coche"),
+    "it": (["porta", "pantografo", "freno", "climatizzazione", "compressore", "motore di trazione", "display", "sensore"],
+           ["bloccata", "guasto", "perdita d'aria", "rumore anomalo", "guasto intermittente", "fuori servizio"],
+           ["sostituito", "regolato", "pulito", "ripristinato", "verificato OK", "serrato"], "carrozza"),
+    "ru": (["дверь", "пантограф", "тормоз", "кондиционер", "компрессор", "тяговый двигатель", "дисплей", "датчик"],
+           ["заблокирована", "неисправен", "утечка воздуха", "посторонний шум", "периодический сбой", "не работает"],
+           ["заменён", "отрегулирован", "очищен", "перезапущен", "проверено ОК", "подтянут"], "вагон"),
+    "kk": (["есік", "пантограф", "тежегіш", "кондиционер", "компрессор", "тарту қозғалтқышы", "дисплей", "датчик"],
+           ["бұғатталған", "ақаулы", "ауа ағуы", "бөгде шу", "мерзімді ақау", "жұмыс істемейді"],
+           ["ауыстырылды", "реттелді", "тазаланды", "қайта іске қосылды", "тексерілді", "тартылды"], "вагон"),
+    "sv": (["dörr", "strömavtagare", "broms", "luftkonditionering", "kompressor", "dragmotor", "skärm", "givare"],
+           ["blockerad", "trasig", "luftläckage", "onormalt ljud", "intermittent fel", "ur funktion"],
+           ["utbytt", "justerad", "rengjord", "återställd", "kontrollerad OK", "åtdragen"], "vagn"),
+}
+
+# One or more values matched by each of the INVALID_PATTERNS of 01_preprocessing.py
+INVALID_PLACEHOLDERS = [
+    "", "   ", "12345", "?!", "aaaaaa", "nan", "na", "n/a - n/a", "N/A - N/A", ". - .",
+    "####", "#NAME?", "---",
+]
+
+# Source columns besides the texts and the project/language/database metadata
+EXTRA_COLUMNS = [
+    "fleet", "subsystem", "problemcode", "failureclass", "date", "pbscode", "symptomcode",
+    "problemremedy", "functionallocation", "notificationsonumber", "rootcause", "documentlink",
+    "minresourcesneed", "maxresourceneed", "averagetime", "frequencyobs",
+]
+
+TEXT_COLUMNS = ["observation", "solution", "observationcategory", "solutioncategory", "problemcause"]
+
+def text_pool(language, size, kind):
+    """`size` distinct texts of one kind ('observation' or 'solution') in one language."""
+    components, faults, actions, car = VOCABULARY[language]
+    second = faults if kind == "observation" else actions
+    base = [f"{component} {word}" for component in components for word in second]
+    return np.array(
+        [base[i % len(base)] + (f" {car} {i // len(base)}" if i >= len(base) else "") for i in range(size)],
+        dtype=object,
+    )
+
+def zipf_choice(rng, size, count, exponent=1.1):
+    """Indices in [0, size) with Zipf-like frequencies: a few texts make up most rows."""
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return rng.choice(size, size=count, p=weights / weights.sum())
+
+def inject(rng, values, rate, replacements):
+    """Replace a `rate` fraction of `values` with random `replacements`."""
+    mask = rng.random(len(values)) < rate
+    values[mask] = np.array(replacements, dtype=object)[rng.integers(0, len(replacements), int(mask.sum()))]
+    return values
+
+def generate_source(name, rows, rng, unique_ratio=0.05, invalid_rate=0.03, null_rate=0.02):
+    """Columns of one synthetic source as a dict of object arrays."""
+    projects, languages = SOURCE_VARIANTS[name]
+    raw_language = np.array(languages, dtype=object)[rng.integers(0, len(languages), rows)]
+    columns = {
+        "project": np.array(projects, dtype=object)[rng.integers(0, len(projects), rows)],
+        "database": np.array(["REX", "Rex"], dtype=object)[rng.integers(0, 2, rows)],
+        "language": inject(rng, raw_language.copy(), null_rate, [None]),
+    }
+    if name == "sts_u400":
+        columns["database"] = inject(rng, columns["database"], 0.1, ["STS_U400_6.0"])
+
+    # Texts follow the language of the row; pool sizes set the duplication rate
+    pool_size = max(len(VOCABULARY["en"][0]) * 6, int(rows * unique_ratio))
+    for column in TEXT_COLUMNS:
+        columns[column] = np.empty(rows, dtype=object)
+    for language in np.unique(raw_language):
+        positions = np.flatnonzero(raw_language == language)
+        vocabulary = VOCABULARY_LANGUAGE[language.lower()]
+        observations = text_pool(vocabulary, pool_size, "observation")
+        solutions = text_pool(vocabulary, pool_size, "solution")
+        components, faults, _, _ = VOCABULARY[vocabulary]
+        columns["observation"][positions] = observations[zipf_choice(rng, pool_size, len(positions))]
+        columns["solution"][positions] = solutions[zipf_choice(rng, pool_size, len(positions))]
+        columns["observationcategory"][positions] = np.array(components + [f"OC-{i:02d}" for i in range(20)], dtype=object)[
+            rng.integers(0, len(components) + 20, len(positions))
+        ]
+        columns["solutioncategory"][positions] = np.array(["Corrective", "Preventive", "SC-01", "SC-02"], dtype=object)[
+            rng.integers(0, 4, len(positions))
+        ]
+        columns["problemcause"][positions] = np.array(faults + [f"PC-{i:03d}" for i in range(50)], dtype=object)[
+            zipf_choice(rng, len(faults) + 50, len(positions))
+        ]
+    for column in TEXT_COLUMNS:
+        columns[column] = inject(rng, columns[column], invalid_rate, INVALID_PLACEHOLDERS)
+        columns[column] = inject(rng, columns[column], null_rate, [None])
+
+    for column in EXTRA_COLUMNS:
+        columns[column] = np.array([f"{column}_{i}" for i in range(30)], dtype=object)[rng.integers(0, 30, rows)]
+    columns["date"] = np.datetime_as_string(
+        np.datetime64("2018-01-01") + rng.integers(0, 2500, rows).astype("timedelta64[D]")
+    ).astype(object)
+    return columns
+
+def generate_sources(directory, total_rows, seed=0, chunk_rows=1_000_000, **options):
+    """
+    Write every source as <directory>/<name>.parquet, splitting `total_rows` unevenly
+    across the sources. Returns the number of rows written per source.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    shares = rng.dirichlet(np.full(len(DATASET_NAMES), 2.0))
+    rows_per_source = np.floor(shares * total_rows).astype(int)
+    rows_per_source[: total_rows - rows_per_source.sum()] += 1
+
+    for index, (name, rows) in enumerate(zip(DATASET_NAMES, rows_per_source.tolist())):
+        source_rng = np.random.default_rng([seed, index])
+        schema = pa.schema([(column, pa.string()) for column in ["project", "database", "language"] + TEXT_COLUMNS + EXTRA_COLUMNS])
+        with pq.ParquetWriter(os.path.join(directory, f"{name}.parquet"), schema) as writer:
+            for start in range(0, max(rows, 1), chunk_rows):
+                columns = generate_source(name, min(chunk_rows, rows - start), source_rng, **options)
+                writer.write_table(pa.table({field.name: pa.array(columns[field.name], type=pa.string()) for field in schema}))
+    return dict(zip(DATASET_NAMES, rows_per_source.tolist()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique-ratio", type=float, default=0.05, help="distinct texts per row of a source language")
+    args = parser.parse_args()
+    written = generate_sources(args.output, args.rows, seed=args.seed, unique_ratio=args.unique_ratio)
+    print(f"Wrote {sum(written.values())} rows in {len(written)} sources to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared helpers for the STS knowledge base recipes (Dataiku project library)."""
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cleaned translated columns embedded for the similar-failure search
+EMBEDDING_COLUMNS = ["sol_final_trns", "obs_final_trns"]
+
+# Bytes of the text hash that identifies a cached vector
+TEXT_HASH_BYTES = 16
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def text_hashes(texts):
+    """BLAKE2b digest of each text, as a fixed-width bytes array (the vector cache key)."""
+    return np.array(
+        [hashlib.blake2b(text.encode("utf-8"), digest_size=TEXT_HASH_BYTES).digest() for text in texts],
+        dtype=f"S{TEXT_HASH_BYTES}",
+    )
+
+def normalize_rows(vectors):
+    """Scale every row to unit L2 norm (zero rows are left as they are)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+class HashingEncoder:
+    """
+    Dependency-free encoder: signed feature hashing of the lowercased words and word bigrams of
+    each text, L2-normalized. It only captures lexical overlap; for local runs and benchmarks.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.model_id = f"hashing-{dim}"
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            for feature in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize_rows(vectors)
+
+class SentenceTransformerEncoder:
+    """A sentence-transformers model on CPU, returning L2-normalized float32 vectors."""
+
+    def __init__(self, model_name, device="cpu", batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.model_id = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.astype(np.float32, copy=False)
+
+def load_encoder(model_name, **kwargs):
+    """
+    Encoder for a model name: "hashing-<dim>" for the HashingEncoder, anything else is loaded
+    with sentence-transformers. Any object with `model_id`, `dim` and `encode(texts)` returning
+    an (n, dim) float32 array can be used instead.
+    """
+    if model_name.startswith("hashing"):
+        dim = model_name.partition("-")[2]
+        return HashingEncoder(int(dim)) if dim else HashingEncoder()
+    return SentenceTransformerEncoder(model_name, **kwargs)
+
+class VectorCache:
+    """
+    Persistent cache of text vectors keyed on the text hash, in `<directory>/<model>/`:
+    `vectors.bin` is a row-major matrix of `dtype` read through a memory map, `ids.bin` the
+    text hash of each row. Both files are append-only and rows are never moved, so row numbers
+    are stable vector ids. Vectors are appended before their ids, so an interrupted `add`
+    leaves at most unreferenced trailing vectors, which are overwritten by the next one.
+    """
+
+    def __init__(self, directory, model_id, dim, dtype="float16"):
+        self.path = os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_id))
+        self.model_id = model_id
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.bin")
+        self._ids_path = os.path.join(self.path, "ids.bin")
+
+        meta_path = os.path.join(self.path, "meta.json")
+        meta = {"model_id": model_id, "dim": dim, "dtype": self.dtype.name}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f)
+            if stored != meta:
+                raise ValueError(f"Vector cache {self.path} holds {stored}, not {meta}; use another directory")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        self._ids = np.fromfile(self._ids_path, dtype=f"S{TEXT_HASH_BYTES}") if os.path.exists(self._ids_path) \
+            else np.empty(0, dtype=f"S{TEXT_HASH_BYTES}")
+        self._sorted = None
+        self._vectors = None
+
+    @classmethod
+    def open(cls, directory, model_id):
+        """Existing cache of a model, with the dimension and dtype it was created with."""
+        path = os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_id), "meta.json")
+        with open(path) as f:
+            meta = json.load(f)
+        return cls(directory, model_id, meta["dim"], meta["dtype"])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup(self, hashes):
+        """Vector id of each text hash, -1 for texts that are not cached."""
+        if self._sorted is None:
+            order = np.argsort(self._ids, kind="stable")
+            self._sorted = (self._ids[order], order)
+        sorted_ids, order = self._sorted
+        ids = np.full(len(hashes), -1, dtype=np.int64)
+        if len(sorted_ids):
+            positions = np.minimum(np.searchsorted(sorted_ids, hashes), len(sorted_ids) - 1)
+            found = sorted_ids[positions] == hashes
+            ids[found] = order[positions[found]]
+        return ids
+
+    def add(self, hashes, vectors):
+        """Append the vectors of texts that are not cached yet; returns the vector id of every hash."""
+        hashes = np.asarray(hashes, dtype=f"S{TEXT_HASH_BYTES}")
+        ids = self.lookup(hashes)
+        new = np.flatnonzero(ids < 0)
+        # Keep the first occurrence of a hash repeated within this call
+        new = new[np.unique(hashes[new], return_index=True)[1]]
+        if len(new):
+            with open(self._vectors_path, "r+b" if os.path.exists(self._vectors_path) else "wb") as f:
+                f.seek(len(self._ids) * self.dim * self.dtype.itemsize)
+                f.write(np.ascontiguousarray(vectors[new], dtype=self.dtype).tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._ids_path, "ab") as f:
+                f.write(hashes[new].tobytes())
+            self._ids = np.concatenate([self._ids, hashes[new]])
+            self._sorted = None
+            self._vectors = None
+            ids = self.lookup(hashes)
+        return ids
+
+    @property
+    def vectors(self):
+        """Read-only memory map of all cached vectors; row i is vector id i."""
+        if self._vectors is None:
+            if not len(self._ids):
+                return np.empty((0, self.dim), dtype=self.dtype)
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(len(self._ids), self.dim))
+        return self._vectors
@@ -0,0 +1,331 @@
+import math
+import zlib
+import logging
+import functools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Order of the accumulated metrics (rouge-* are F-scores)
+METRIC_NAMES = ["bleu", "rouge-1", "rouge-2", "rouge-l", "meteor"]
+
+# sentence_bleu defaults (uniform 4-gram weights) and the `k` of SmoothingFunction().method4
+BLEU_MAX_ORDER = 4
+BLEU_SMOOTHING_K = 5
+
+# Columns added by stratified_sample
+SAMPLE_WEIGHT_COLUMN = "sample_weight"
+SAMPLE_STRATUM_COLUMN = "sample_stratum"
+
+# Upper bound on the bootstrap draw-count matrix (resamples x stratum rows) built at once
+BOOTSTRAP_BLOCK_CELLS = 2_000_000
+
+class TextTokens:
+    """
+    Tokens of one text, computed once and shared by every pair it appears in:
+    whitespace tokens and n-gram counts for BLEU/METEOR, and the sentence words and
+    n-gram sets the `rouge` package derives (sentences split on '.').
+    """
+    __slots__ = ("words", "bleu_counts", "rouge_sentences", "rouge_sentence_sets", "rouge_words", "rouge_ngrams")
+
+    def __init__(self, text):
+        self.words = text.split()
+        self.bleu_counts = [
+            Counter(zip(*[self.words[i:] for i in range(n)])) for n in range(1, BLEU_MAX_ORDER + 1)
+        ]
+        sentences = [" ".join(part.split()) for part in text.split(".") if len(part) > 0]
+        self.rouge_sentences = [sentence.split(" ") for sentence in sentences]
+        self.rouge_sentence_sets = [set(words) for words in self.rouge_sentences]
+        words = [word for sentence in self.rouge_sentences for word in sentence]
+        self.rouge_words = set(words)
+        self.rouge_ngrams = [set(words), set(zip(words, words[1:]))]
+
+def bleu_score(reference, candidate):
+    """Same value as nltk sentence_bleu([reference], candidate) with SmoothingFunction().method4."""
+    hyp_len = len(candidate.words)
+    numerators = [
+        sum((hyp_counts & ref_counts).values())
+        for hyp_counts, ref_counts in zip(candidate.bleu_counts, reference.bleu_counts)
+    ]
+    if numerators[0] == 0:
+        return 0.0
+
+    ref_len = len(reference.words)
+    if hyp_len > ref_len:
+        brevity_penalty = 1.0
+    else:
+        brevity_penalty = math.exp(1 - ref_len / hyp_len)
+
+    precisions = []
+    smoothing_step = 1
+    for n, numerator in enumerate(numerators, start=1):
+        denominator = max(1, hyp_len - n + 1)
+        if numerator == 0 and hyp_len > 1:
+            precisions.append(1 / (2 ** smoothing_step * BLEU_SMOOTHING_K / math.log(hyp_len)) / denominator)
+            smoothing_step += 1
+        else:
+            precisions.append(numerator / denominator)
+    weight = 1 / BLEU_MAX_ORDER
+    return brevity_penalty * math.exp(math.fsum(weight * math.log(p) for p in precisions if p > 0))
+
+def _f_score(overlap, evaluated_count, reference_count):
+    precision = overlap / evaluated_count if evaluated_count else 0.0
+    recall = overlap / reference_count if reference_count else 0.0
+    return 2.0 * ((precision * recall) / (precision + recall + 1e-8))
+
+def _lcs_words(x, y):
+    """Words of the longest common subsequence reconstructed like rouge_score._recon_lcs."""
+    n, m = len(x), len(y)
+    table = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        word, row, previous = x[i - 1], table[i], table[i - 1]
+        for j in range(1, m + 1):
+            if word == y[j - 1]:
+                row[j] = previous[j - 1] + 1
+            else:
+                row[j] = previous[j] if previous[j] > row[j - 1] else row[j - 1]
+
+    words = set()
+    i, j = n, m
+    while i and j:
+        if x[i - 1] == y[j - 1]:
+            words.add(x[i - 1])
+            i, j = i - 1, j - 1
+        elif table[i - 1][j] > table[i][j - 1]:
+            i -= 1
+        else:
+            j -= 1
+    return words
+
+def rouge_scores(reference, candidate):
+    """
+    Same F-scores as Rouge().get_scores(candidate, reference) for rouge-1, rouge-2 and
+    rouge-l (summary level, exclusive n-gram sets).
+    """
+    rouge_n = [
+        _f_score(len(hyp_ngrams & ref_ngrams), len(hyp_ngrams), len(ref_ngrams))
+        for hyp_ngrams, ref_ngrams in zip(candidate.rouge_ngrams, reference.rouge_ngrams)
+    ]
+
+    # The union of the LCS words of every (reference sentence, candidate sentence) pair;
+    # a pair whose shared words are already in the union cannot add to it
+    common_words = reference.rouge_words & candidate.rouge_words
+    lcs_union = set()
+    for ref_words, ref_set in zip(reference.rouge_sentences, reference.rouge_sentence_sets):
+        if lcs_union >= common_words:
+            break
+        for hyp_words, hyp_set in zip(candidate.rouge_sentences, candidate.rouge_sentence_sets):
+            if not (ref_set & hyp_set) - lcs_union:
+                continue
+            lcs_union |= _lcs_words(ref_words, hyp_words)
+    rouge_l = _f_score(len(lcs_union), len(candidate.rouge_words), len(reference.rouge_words))
+    return rouge_n + [rouge_l]
+
+class _MemoizedMethod:
+    """Proxy exposing one memoized method of the wrapped object."""
+
+    def __init__(self, wrapped, method_name):
+        setattr(self, method_name, functools.lru_cache(maxsize=None)(getattr(wrapped, method_name)))
+
+@functools.lru_cache(maxsize=None)
+def _meteor_resources():
+    # meteor_score stems and looks up the synsets of every word of every pair;
+    # memoizing them per word keeps the wordnet work proportional to the vocabulary
+    from nltk.corpus import wordnet
+    from nltk.stem.porter import PorterStemmer
+
+    return _MemoizedMethod(PorterStemmer(), "stem"), _MemoizedMethod(wordnet, "synsets")
+
+def meteor(reference, candidate):
+    """nltk meteor_score on the whitespace tokens (needs the wordnet corpus)."""
+    from nltk.translate.meteor_score import meteor_score
+
+    stemmer, wordnet = _meteor_resources()
+    return meteor_score([reference.words], candidate.words, stemmer=stemmer, wordnet=wordnet)
+
+def score_pair(reference, candidate):
+    """All METRIC_NAMES for one (reference, candidate) pair of TextTokens, or None if ROUGE cannot score it."""
+    if not reference.rouge_sentences or not candidate.rouge_sentences:
+        # The rouge package raises on texts without any sentence (e.g. only periods)
+        return None
+    return [bleu_score(reference, candidate)] + rouge_scores(reference, candidate) + [meteor(reference, candidate)]
+
+def score_rows(frame, reference_columns, candidate_columns):
+    """
+    Metric sums and number of scored (reference, candidate) cell pairs of every row.
+    Each distinct text is tokenized once and each distinct pair is scored once;
+    its scores are broadcast back to the rows that share it.
+    Returns (row metric sums, row pair counts, number of skipped pairs).
+    """
+    tokens = {}
+
+    def tokenize(texts):
+        for text in texts:
+            if text not in tokens:
+                tokens[text] = TextTokens(text)
+        return [tokens[text] for text in texts]
+
+    row_sums = np.zeros((len(frame), len(METRIC_NAMES)))
+    row_counts = np.zeros(len(frame), dtype=np.int64)
+    skipped = 0
+    for ref_col, cand_col in zip(reference_columns, candidate_columns):
+        ref_codes, ref_texts = pd.factorize(frame[ref_col])
+        cand_codes, cand_texts = pd.factorize(frame[cand_col])
+        # Missing reference or candidate texts are skipped
+        valid = np.flatnonzero((ref_codes >= 0) & (cand_codes >= 0))
+        skipped += len(frame) - len(valid)
+
+        pair_codes = ref_codes[valid].astype(np.int64) * max(len(cand_texts), 1) + cand_codes[valid]
+        unique_pairs, pair_index = np.unique(pair_codes, return_inverse=True)
+        ref_tokens = tokenize(ref_texts)
+        cand_tokens = tokenize(cand_texts)
+        pair_scores = np.zeros((len(unique_pairs), len(METRIC_NAMES)))
+        pair_scored = np.zeros(len(unique_pairs), dtype=bool)
+        for i, pair in enumerate(unique_pairs.tolist()):
+            ref_code, cand_code = divmod(pair, max(len(cand_texts), 1))
+            scores = score_pair(ref_tokens[ref_code], cand_tokens[cand_code])
+            if scores is not None:
+                pair_scores[i] = scores
+                pair_scored[i] = True
+
+        scored = pair_scored[pair_index]
+        skipped += int((~scored).sum())
+        row_sums[valid] += pair_scores[pair_index]
+        row_counts[valid] += scored
+    return row_sums, row_counts, skipped
+
+def stratified_sample(df, strata_columns, fraction=None, size=None, seed=0):
+    """
+    Sample each stratum of `strata_columns` independently: `fraction` of its rows and/or at
+    most `size` rows (at least one row per stratum). Each stratum draws from its own seed,
+    derived from `seed` and the stratum key, so a stratum's sample does not depend on the
+    others. Adds the SAMPLE_WEIGHT_COLUMN (stratum rows per sampled row) and the
+    SAMPLE_STRATUM_COLUMN (stratum id) used for the weighted estimates and the bootstrap.
+    """
+    if fraction is None and size is None:
+        raise ValueError("stratified_sample needs a sample fraction or a sample size per stratum")
+
+    strata = df.groupby(strata_columns, observed=True, dropna=False, sort=True).indices
+    positions, weights, stratum_ids = [], [], []
+    for stratum_id, (key, rows) in enumerate(strata.items()):
+        sample_size = len(rows)
+        if fraction is not None:
+            sample_size = max(1, int(round(fraction * len(rows))))
+        if size is not None:
+            sample_size = min(sample_size, size)
+        rng = np.random.default_rng([seed, zlib.crc32(repr(key).encode("utf-8"))])
+        chosen = np.sort(rng.choice(rows, size=sample_size, replace=False))
+        positions.append(chosen)
+        weights.append(np.full(sample_size, len(rows) / sample_size))
+        stratum_ids.append(np.full(sample_size, stratum_id))
+
+    sample = df.iloc[np.concatenate(positions)].copy()
+    sample[SAMPLE_WEIGHT_COLUMN] = np.concatenate(weights)
+    sample[SAMPLE_STRATUM_COLUMN] = np.concatenate(stratum_ids)
+    return sample
+
+def bootstrap_intervals(row_sums, row_counts, weights, strata, resamples, confidence_level, seed):
+    """
+    Percentile bootstrap interval of the weighted metric averages (sum of weighted row sums
+    over sum of weighted pair counts). Rows are resampled with replacement within each
+    stratum, so every resample keeps the stratum sizes of the sample.
+    Returns (lower bounds, upper bounds), one value per metric.
+    """
+    rng = np.random.default_rng(seed)
+    numerators = np.zeros((resamples, row_sums.shape[1]))
+    denominators = np.zeros(resamples)
+    weighted_sums = row_sums * weights[:, None]
+    weighted_counts = row_counts * weights
+    for rows in pd.Series(np.arange(len(strata))).groupby(strata).indices.values():
+        # Multinomial draw counts of each row, in blocks that keep the count matrix small
+        block = max(1, BOOTSTRAP_BLOCK_CELLS // len(rows))
+        for start in range(0, resamples, block):
+            stop = min(start + block, resamples)
+            draws = rng.multinomial(len(rows), np.full(len(rows), 1 / len(rows)), size=stop - start)
+            numerators[start:stop] += draws @ weighted_sums[rows]
+            denominators[start:stop] += draws @ weighted_counts[rows]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        estimates = numerators / denominators[:, None]
+    tail = (1 - confidence_level) / 2 * 100
+    lower, upper = np.nanpercentile(estimates, [tail, 100 - tail], axis=0)
+    return lower, upper
+
+def evaluate_language(frame, reference_columns, candidate_columns, bootstrap_resamples=0, confidence_level=0.95, seed=0):
+    """
+    Average the metrics of every (reference, candidate) cell pair of one language. Rows of a
+    stratified sample are weighted by their SAMPLE_WEIGHT_COLUMN and, with
+    `bootstrap_resamples`, get percentile confidence intervals.
+    Returns (metric averages, number of scored pairs, number of skipped pairs, (lower, upper) or None).
+    """
+    row_sums, row_counts, skipped = score_rows(frame, reference_columns, candidate_columns)
+    if SAMPLE_WEIGHT_COLUMN in frame.columns:
+        weights = frame[SAMPLE_WEIGHT_COLUMN].to_numpy(dtype=float)
+        strata = frame[SAMPLE_STRATUM_COLUMN].to_numpy()
+    else:
+        weights = np.ones(len(frame))
+        strata = np.zeros(len(frame), dtype=np.int64)
+
+    count = int(row_counts.sum())
+    total_weight = float(row_counts @ weights)
+    averages = weights @ row_sums / total_weight if total_weight else np.zeros(len(METRIC_NAMES))
+
+    intervals = None
+    if bootstrap_resamples and count:
+        intervals = bootstrap_intervals(row_sums, row_counts, weights, strata, bootstrap_resamples, confidence_level, seed)
+    return averages, count, skipped, intervals
+
+def evaluate_corpus(
+    df, reference_columns, candidate_columns, language_column="language", workers=1,
+    bootstrap_resamples=0, confidence_level=0.95, seed=0
+):
+    """
+    Average BLEU, ROUGE-1/2/L and METEOR per language.
+    With `workers` > 1 the languages are sharded across a process pool. With
+    `bootstrap_resamples`, the summary also gets avg_<metric>_ci_lower/_ci_upper columns
+    at `confidence_level`.
+    Returns (summary DataFrame in the trns_eval_result layout, number of skipped pairs).
+    """
+    columns = list(reference_columns) + list(candidate_columns)
+    columns += [col for col in (SAMPLE_WEIGHT_COLUMN, SAMPLE_STRATUM_COLUMN) if col in df.columns]
+    language_codes, languages = pd.factorize(df[language_column].astype(object), use_na_sentinel=False)
+    groups = {
+        language: df[columns].iloc[np.flatnonzero(language_codes == code)]
+        for code, language in enumerate(languages)
+    }
+
+    def language_arguments(language, frame):
+        # The bootstrap seed depends on the language only, not on the other languages present
+        language_seed = [seed, zlib.crc32(str(language).encode("utf-8"))]
+        return frame, reference_columns, candidate_columns, bootstrap_resamples, confidence_level, language_seed
+
+    if workers > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as executor:
+            futures = {
+                language: executor.submit(evaluate_language, *language_arguments(language, frame))
+                for language, frame in groups.items()
+            }
+            results = {language: future.result() for language, future in futures.items()}
+    else:
+        results = {
+            language: evaluate_language(*language_arguments(language, frame))
+            for language, frame in groups.items()
+        }
+
+    summary_results = []
+    skipped = 0
+    for language, (averages, count, language_skipped, intervals) in results.items():
+        summary = {"language": language, **{f"avg_{name}": float(value) for name, value in zip(METRIC_NAMES, averages)}}
+        if bootstrap_resamples:
+            lower, upper = intervals if intervals is not None else (np.full(len(METRIC_NAMES), np.nan),) * 2
+            for name, low, high in zip(METRIC_NAMES, lower, upper):
+                summary[f"avg_{name}_ci_lower"] = float(low)
+                summary[f"avg_{name}_ci_upper"] = float(high)
+        summary_results.append(summary)
+        skipped += language_skipped
+        logger.info(f"Evaluated {count} pairs for language {language}")
+    return pd.DataFrame(summary_results), skipped
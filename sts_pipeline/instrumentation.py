@@ -0,0 +1,186 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import threading
+import datetime
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Run reports are written to this directory (relative to the working directory by default)
+RUN_REPORT_DIR_ENV = "STS_RUN_REPORT_DIR"
+DEFAULT_RUN_REPORT_DIR = "run_reports"
+
+# How often the background sampler reads the resident memory of the process
+MEMORY_SAMPLE_INTERVAL_SECONDS = 0.05
+
+# Upper bounds of the histogram buckets (seconds for latencies); the last bucket is open
+HISTOGRAM_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+def current_rss():
+    """Resident set size of this process in bytes, or None when it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def summarize_values(values):
+    """Count, sum, min/mean/max, percentiles and HISTOGRAM_BUCKETS counts of a list of observations."""
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values, dtype=float)
+    p50, p90, p95, p99 = np.percentile(array, [50, 90, 95, 99])
+    bucket_counts = np.bincount(np.searchsorted(HISTOGRAM_BUCKETS, array), minlength=len(HISTOGRAM_BUCKETS) + 1)
+    labels = [f"le_{bound:g}" for bound in HISTOGRAM_BUCKETS] + ["inf"]
+    return {
+        "count": int(array.size),
+        "sum": float(array.sum()),
+        "min": float(array.min()),
+        "mean": float(array.mean()),
+        "max": float(array.max()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p95": float(p95),
+        "p99": float(p99),
+        "buckets": dict(zip(labels, bucket_counts.tolist())),
+    }
+
+def iter_run_reports(run_name, directory=None):
+    """Reports previously written by RunReport(run_name).write(), newest first."""
+    directory = directory or os.environ.get(RUN_REPORT_DIR_ENV) or DEFAULT_RUN_REPORT_DIR
+    for path in sorted(glob.glob(os.path.join(directory, f"{run_name}_*.json")), reverse=True):
+        try:
+            with open(path, encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Skipping unreadable run report {path}")
+
+class RunReport:
+    """
+    Lightweight, thread-safe instrumentation of one recipe run:
+    - `stage(name)`: wall time, resident memory at start/end and sampled peak of a block;
+      the yielded dict takes extra fields such as `rows_out`
+    - `timer(name)`: total time and number of calls of a block entered many times
+    - `count(name, value)`: counters, e.g. rows dropped by a cleaning rule
+    - `observe(name, value)`: histograms, e.g. LLM call latencies
+    `write()` stores everything as one JSON document per run.
+    """
+
+    def __init__(self, run_name, sample_interval=MEMORY_SAMPLE_INTERVAL_SECONDS):
+        self.run_name = run_name
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.metadata = {}
+        self.stages = []
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._active = []
+        self._local = threading.local()
+        self._peak_rss = current_rss()
+        self._sample_interval = sample_interval
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_memory, name="run-report-memory", daemon=True)
+        self._sampler.start()
+
+    def _sample_memory(self):
+        while not self._stop.wait(self._sample_interval):
+            self._record_rss(current_rss())
+
+    def _record_rss(self, rss):
+        if rss is None:
+            return
+        with self._lock:
+            self._peak_rss = max(self._peak_rss or 0, rss)
+            for record in self._active:
+                record["peak_rss_bytes"] = max(record["peak_rss_bytes"] or 0, rss)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Time a pipeline stage; nested stages are named 'parent/child'."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        full_name = "/".join(stack + [name])
+        rss = current_rss()
+        record = {"name": full_name, **fields, "rss_start_bytes": rss, "peak_rss_bytes": rss}
+        with self._lock:
+            self._active.append(record)
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - started
+            stack.pop()
+            rss = current_rss()
+            self._record_rss(rss)
+            with self._lock:
+                self._active.remove(record)
+                record["rss_end_bytes"] = rss
+                self.stages.append(record)
+            logger.info(f"Stage '{full_name}' took {record['wall_seconds']:.2f}s")
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulate the time spent in a block that runs many times (e.g. per chunk or column)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                timer = self.timers.setdefault(name, {"calls": 0, "total_seconds": 0.0})
+                timer["calls"] += 1
+                timer["total_seconds"] += elapsed
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    def annotate(self, **metadata):
+        """Attach run-level settings or facts (e.g. batch sizes, input datasets) to the report."""
+        with self._lock:
+            self.metadata.update(metadata)
+
+    def to_dict(self):
+        self._record_rss(current_rss())
+        with self._lock:
+            return {
+                "run_name": self.run_name,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "wall_seconds": time.perf_counter() - self._started,
+                "peak_rss_bytes": self._peak_rss,
+                "python": sys.version.split()[0],
+                "metadata": dict(self.metadata),
+                "stages": [dict(record) for record in self.stages],
+                "timers": {name: dict(timer) for name, timer in self.timers.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: summarize_values(values) for name, values in self.histograms.items()},
+            }
+
+    def write(self, directory=None):
+        """Stop the memory sampler and write the report to `<directory>/<run_name>_<UTC timestamp>.json`."""
+        self._stop.set()
+        directory = directory or os.environ.get(RUN_REPORT_DIR_ENV) or DEFAULT_RUN_REPORT_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_name}_{self.started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        logger.info(f"Run report written to {path}")
+        return path
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+
+import regex
+
+from sts_pipeline.translation_need import TOKEN_PATTERN, is_code_token
+
+logger = logging.getLogger(__name__)
+
+# OPUS-MT (MarianMT) models of the local backend; Kazakh has no direct model and stays on the LLM.
+# Convert each one to CTranslate2 with int8 weights into <model_dir>/<language>-en:
+#   ct2-transformers-converter --model Helsinki-NLP/opus-mt-fr-en --output_dir <model_dir>/fr-en \
+#       --quantization int8 --copy_files source.spm target.spm
+OPUS_MT_MODELS = {
+    "fr": "Helsinki-NLP/opus-mt-fr-en",
+    "es": "Helsinki-NLP/opus-mt-es-en",
+    "it": "Helsinki-NLP/opus-mt-it-en",
+    "ru": "Helsinki-NLP/opus-mt-ru-en",
+    "sv": "Helsinki-NLP/opus-mt-sv-en",
+}
+
+SENTENCE_BREAK_PATTERN = regex.compile(r"[.!?;]\s+\p{L}|\n")
+SCRIPT_PATTERNS = [regex.compile(r"\p{Latin}"), regex.compile(r"\p{Cyrillic}"), regex.compile(r"[^\P{L}\p{Latin}\p{Cyrillic}]")]
+REPEATED_WORD_PATTERN = regex.compile(r"\b(\w+)(?:\W+\1\b){3,}", regex.IGNORECASE)
+
+def length_batches(texts, max_batch_size):
+    """Positions of `texts` sorted by length and cut into batches, so a batch pads to similar lengths."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[start:start + max_batch_size] for start in range(0, len(order), max_batch_size)]
+
+def route_to_local(language, text, languages, max_words):
+    """
+    Whether a unit can be translated by the local backend: its language is supported and the
+    text is short and unambiguous. Long texts, several sentences and words in mixed scripts
+    (codes aside) go to the LLM.
+    """
+    if language not in languages or len(text.split()) > max_words:
+        return False
+    if SENTENCE_BREAK_PATTERN.search(text):
+        return False
+    words = " ".join(token for token in TOKEN_PATTERN.findall(text) if not is_code_token(token))
+    return sum(pattern.search(words) is not None for pattern in SCRIPT_PATTERNS) <= 1
+
+def is_suspect_translation(source, translation):
+    """Local output to escalate to the LLM: empty, far shorter or longer than the source, or looping."""
+    if not translation.strip():
+        return True
+    ratio = len(translation) / max(len(source), 1)
+    return not 1 / 3 <= ratio <= 3 or (REPEATED_WORD_PATTERN.search(translation) is not None
+                                       and REPEATED_WORD_PATTERN.search(source) is None)
+
+class CTranslate2Translator:
+    """
+    OPUS-MT models converted to CTranslate2 (see OPUS_MT_MODELS), translating to English on
+    CPU with int8 weights. One model is loaded per language on first use; `threads` is the
+    number of intra-op threads of each model.
+    """
+
+    def __init__(self, model_dir, threads=4, batch_size=64, beam_size=2, compute_type="int8"):
+        import ctranslate2
+        import sentencepiece
+
+        self._ctranslate2 = ctranslate2
+        self._sentencepiece = sentencepiece
+        self.model_dir = model_dir
+        self.model_id = f"ctranslate2:{os.path.basename(os.path.normpath(model_dir))}:{compute_type}"
+        self.languages = frozenset(
+            language for language in OPUS_MT_MODELS if os.path.isdir(os.path.join(model_dir, f"{language}-en"))
+        )
+        self.threads = threads
+        self.batch_size = batch_size
+        self.beam_size = beam_size
+        self.compute_type = compute_type
+        self._models = {}
+        if not self.languages:
+            logger.warning(f"No converted OPUS-MT model in {model_dir}; every unit goes to the LLM")
+
+    def _model(self, language):
+        if language not in self._models:
+            path = os.path.join(self.model_dir, f"{language}-en")
+            translator = self._ctranslate2.Translator(
+                path, device="cpu", compute_type=self.compute_type, inter_threads=1, intra_threads=self.threads
+            )
+            source = self._sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "source.spm"))
+            target = self._sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "target.spm"))
+            self._models[language] = (translator, source, target)
+        return self._models[language]
+
+    def translate(self, language, texts):
+        translator, source, target = self._model(language)
+        tokens = [source.encode(text, out_type=str) + ["</s>"] for text in texts]
+        results = translator.translate_batch(
+            tokens, max_batch_size=self.batch_size, beam_size=self.beam_size, max_decoding_length=256
+        )
+        return [target.decode(result.hypotheses[0]) for result in results]
+
+class MockTranslator:
+    """
+    Deterministic offline backend answering "[local-en] <text>" after `latency` seconds per
+    batch; records the size of every batch it receives.
+    """
+
+    def __init__(self, languages=None, latency=0.0):
+        self.model_id = "mock"
+        self.languages = frozenset(languages if languages is not None else OPUS_MT_MODELS)
+        self.latency = latency
+        self.batches = []
+
+    def translate(self, language, texts):
+        self.batches.append(len(texts))
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[local-en] {text}" for text in texts]
+
+def load_translator(backend, model_dir=None, threads=4, batch_size=64):
+    """
+    Local translation backend: "ctranslate2" for the converted OPUS-MT models in `model_dir`,
+    "mock" for offline runs. Any object with `model_id`, `languages` and
+    `translate(language, texts)` returning one English text per input can be used instead.
+    """
+    if backend == "mock":
+        return MockTranslator()
+    if backend == "ctranslate2":
+        return CTranslate2Translator(model_dir, threads=threads, batch_size=batch_size)
+    raise ValueError(f"Unknown local translation backend {backend!r}")
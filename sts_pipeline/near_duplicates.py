@@ -0,0 +1,170 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Prime modulus of the MinHash permutations (a * h + b) mod p, small enough for uint64 products
+MINHASH_PRIME = (1 << 31) - 1
+
+NUMBER_PATTERN = re.compile(r"\d+")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+def normalize_for_matching(text):
+    """Lowercase text with punctuation and spacing collapsed, for shingling."""
+    return NON_WORD_PATTERN.sub(" ", str(text).lower()).strip()
+
+def shingle_hashes(text, size):
+    """crc32 of the distinct character `size`-grams of a text (the whole text when it is shorter)."""
+    if len(text) <= size:
+        return {zlib.crc32(text.encode("utf-8"))} if text else set()
+    return {zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)}
+
+def minhash_signatures(shingle_sets, num_perm, seed=0):
+    """(n, num_perm) uint32 MinHash signatures of non-empty shingle sets."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    lengths = np.fromiter((len(shingles) for shingles in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    hashes = np.fromiter((h for shingles in shingle_sets for h in shingles), dtype=np.uint64, count=int(lengths.sum()))
+    hashes %= MINHASH_PRIME
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint32)
+    for permutation in range(num_perm):
+        values = (a[permutation] * hashes + b[permutation]) % MINHASH_PRIME
+        signatures[:, permutation] = np.minimum.reduceat(values, starts)
+    return signatures
+
+def lsh_candidate_pairs(signatures, bands):
+    """
+    Pairs (u, v) of signatures that agree on all rows of at least one band. Within each band
+    bucket, every member is paired with the first one and with the next one, which links the
+    bucket with O(n) pairs instead of all O(n^2).
+    """
+    rows = signatures.shape[1] // bands
+    pairs = []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(rows):
+            keys = keys * np.uint64(0x100000001B3) + block[:, column]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        same_as_next = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+        if not len(same_as_next):
+            continue
+        group_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        first_of_group = order[group_start[np.searchsorted(group_start, same_as_next + 1, side="right") - 1]]
+        pairs.append(np.stack([order[same_as_next], order[same_as_next + 1]], axis=1))
+        pairs.append(np.stack([first_of_group, order[same_as_next + 1]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs)
+    pairs = np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1)
+    return np.unique(pairs, axis=0)
+
+def connected_components(count, pairs):
+    """Component of each node, labelled by its smallest node, by min-label propagation with pointer jumping."""
+    labels = np.arange(count)
+    if not len(pairs):
+        return labels
+    u, v = pairs[:, 0], pairs[:, 1]
+    while True:
+        smallest = np.minimum(labels[u], labels[v])
+        updated = labels.copy()
+        np.minimum.at(updated, u, smallest)
+        np.minimum.at(updated, v, smallest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+def cluster_near_duplicates(texts, counts, threshold=0.85, num_perm=64, bands=16, shingle_size=4, seed=0):
+    """
+    Cluster unique texts whose estimated Jaccard similarity (MinHash over character shingles of
+    the normalized text) reaches `threshold`, via LSH candidate pairs. The representative of a
+    cluster is its most frequent text (`counts`, e.g. rows per text), first one on ties; members
+    less similar than `threshold` to it are left on their own. Texts that differ in their digit
+    sequences are never clustered, so unit, car and part numbers are never traded for another
+    text's. Returns, per text, the position of its representative and the estimated
+    similarity to it.
+    """
+    shingle_sets = [shingle_hashes(normalize_for_matching(text), shingle_size) for text in texts]
+    representative = np.arange(len(texts))
+    similarity = np.ones(len(texts))
+    clustered = np.flatnonzero([len(shingles) > 0 for shingles in shingle_sets])
+    if len(clustered) < 2:
+        return representative, similarity
+
+    signatures = minhash_signatures([shingle_sets[i] for i in clustered], num_perm, seed)
+    pairs = lsh_candidate_pairs(signatures, bands)
+    if len(pairs):
+        pairs = pairs[(signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1) >= threshold]
+    components = connected_components(len(clustered), pairs)
+    # Split every component by the numbers of its texts
+    numbers = [tuple(NUMBER_PATTERN.findall(str(texts[i]))) for i in clustered]
+    components = pd.factorize(pd.Series(list(zip(components, numbers))))[0]
+
+    # Most frequent text of each component (the earliest one on ties)
+    counts = np.asarray(counts)[clustered]
+    order = np.lexsort((np.arange(len(clustered)), -counts, components))
+    is_first = np.r_[True, components[order][1:] != components[order][:-1]]
+    component_representative = np.empty(len(clustered), dtype=np.int64)
+    component_representative[components[order][is_first]] = order[is_first]
+    local_representative = component_representative[components]
+
+    local_similarity = (signatures == signatures[local_representative]).mean(axis=1)
+    # Chains of pairs can link texts that are not similar to the representative
+    kept = local_similarity >= threshold
+    representative[clustered[kept]] = clustered[local_representative[kept]]
+    similarity[clustered[kept]] = local_similarity[kept]
+    return representative, similarity
+
+def near_duplicate_map(df, columns, language_column="language", skipped_languages=(), **cluster_options):
+    """
+    Near-duplicate clusters of each text column, per language. Returns the mapping of every
+    collapsed text to its representative (column, language, text, representative, similarity,
+    cluster_size) and per column/language statistics.
+    """
+    mappings, stats = [], []
+    for column in columns:
+        values = df[[language_column, column]].dropna()
+        values = values[(values[column].astype(str).str.strip() != "") & ~values[language_column].isin(skipped_languages)]
+        for language, texts in values.groupby(language_column, observed=True, sort=True)[column]:
+            counts = texts.value_counts(sort=False)
+            unique_texts = counts.index.to_numpy(dtype=object)
+            representative, similarity = cluster_near_duplicates(unique_texts, counts.to_numpy(), **cluster_options)
+            cluster_sizes = np.bincount(representative, minlength=len(unique_texts))
+            collapsed = np.flatnonzero(representative != np.arange(len(unique_texts)))
+            mappings.append(pd.DataFrame({
+                "column": column,
+                "language": language,
+                "text": unique_texts[collapsed],
+                "representative": unique_texts[representative[collapsed]],
+                "similarity": similarity[collapsed],
+                "cluster_size": cluster_sizes[representative[collapsed]],
+            }))
+            stats.append({
+                "column": column,
+                "language": language,
+                "rows": len(texts),
+                "texts": len(unique_texts),
+                "clusters": int((cluster_sizes > 1).sum()),
+                "collapsed_texts": len(collapsed),
+                "collapsed_rows": int(counts.to_numpy()[collapsed].sum()),
+                "largest_cluster": int(cluster_sizes.max()),
+                "text_reduction": len(collapsed) / len(unique_texts),
+            })
+    mapping_columns = ["column", "language", "text", "representative", "similarity", "cluster_size"]
+    mapping = pd.concat(mappings, ignore_index=True) if mappings else pd.DataFrame(columns=mapping_columns)
+    return mapping, pd.DataFrame(stats)
+
+def representative_texts(df, column, mapping, language_column="language"):
+    """The texts of a column with every collapsed text replaced by its cluster representative."""
+    members = mapping[mapping["column"] == column]
+    keys = pd.MultiIndex.from_arrays([members["language"].astype(str), members["text"].astype(str)])
+    positions = keys.get_indexer(pd.MultiIndex.from_arrays([df[language_column].astype(str), df[column].astype(str)]))
+    replaced = positions >= 0
+    texts = df[column].astype(object).copy()
+    texts[replaced] = members["representative"].to_numpy(dtype=object)[positions[replaced]]
+    return texts
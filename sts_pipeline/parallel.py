@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Below this many texts per shard, a map runs in the calling process
+MIN_SHARD_TEXTS = 5000
+
+# Shards per worker, so that shards of uneven cost (e.g. longer texts) still keep every worker busy
+SHARDS_PER_WORKER = 4
+
+def texts_to_buffer(texts):
+    """Arrow IPC stream of a string column: a few contiguous buffers instead of one pickled object per text."""
+    import pyarrow as pa
+
+    batch = pa.record_batch([pa.array(texts, type=pa.string())], names=["text"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+def buffer_to_texts(buffer):
+    """Object array of the texts of a texts_to_buffer stream."""
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(buffer).read_all().column(0).to_numpy(zero_copy_only=False)
+
+def map_shard(func, buffer, args):
+    """Worker side of ParallelTextMapper: decode a shard, apply `func`, encode the results."""
+    return texts_to_buffer(func(buffer_to_texts(buffer), *args))
+
+class ParallelTextMapper:
+    """
+    Apply an element-wise text function to arrays of texts in a process pool. Texts are split
+    into contiguous shards that travel to the workers and back as Arrow IPC buffers, and the
+    results are reassembled in order, so the output is exactly that of `func(texts, *args)`.
+    With a single worker, few texts or non-string values, `func` runs in the calling process.
+    The pool is started on first use and reused until `close()`.
+    """
+
+    def __init__(self, workers=1, min_shard_texts=MIN_SHARD_TEXTS):
+        self.workers = workers
+        self.min_shard_texts = min_shard_texts
+        self._executor = None
+
+    def submit(self, func, texts, *args):
+        """
+        Start applying `func` (importable by the workers, i.e. defined in a module) to `texts`;
+        returns a pending result for `gather`, so that several maps can run at once.
+        """
+        shards = min(self.workers * SHARDS_PER_WORKER, len(texts) // self.min_shard_texts)
+        if self.workers > 1 and shards > 1:
+            import pyarrow as pa
+            try:
+                buffers = [texts_to_buffer(part) for part in np.array_split(np.asarray(texts, dtype=object), shards)]
+            except (pa.ArrowInvalid, pa.ArrowTypeError, UnicodeEncodeError):
+                logger.debug("Texts are not all valid strings, mapping them in the calling process")
+            else:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                return [self._executor.submit(map_shard, func, buffer, args) for buffer in buffers]
+        return [np.asarray(func(texts, *args), dtype=object)]
+
+    def gather(self, pending):
+        """Results of a `submit`, as an object array in the order of its texts."""
+        parts = [buffer_to_texts(part.result()) if isinstance(part, Future) else part for part in pending]
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def map(self, func, texts, *args):
+        return self.gather(self.submit(func, texts, *args))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
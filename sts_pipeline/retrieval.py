@@ -0,0 +1,360 @@
+import os
+import json
+import shutil
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Metadata the queries can filter on
+FILTER_COLUMNS = ["project", "language", "subsystem"]
+
+# Spherical k-means training of the list centroids
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 64
+
+# Lists scanned per query by default
+DEFAULT_NPROBE = 16
+
+# Filters selecting at most this many items are answered by an exact scan of those items,
+# so that selective filters still return k results
+EXACT_SEARCH_MAX_ITEMS = 20000
+
+# Item masks of the most recently used filters (and the items of selective ones) are kept for the next queries
+FILTER_CACHE_SIZE = 8
+
+# Rows per matrix product in k-means assignment
+ASSIGN_BLOCK_ROWS = 65536
+
+def default_nlist(count):
+    """About sqrt(count) lists, which balances centroid and list scanning costs."""
+    return int(min(65536, max(1, round(np.sqrt(count)))))
+
+def normalize_queries(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def assign_lists(vectors, centroids):
+    """Index of the closest centroid (highest inner product) of each vector, computed in blocks."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means centroids of a sample of `vectors` (unit rows), as an (nlist, dim) float32 array."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLES_PER_LIST)
+    sample = normalize_queries(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+    for _ in range(iterations):
+        assignments = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Empty lists are re-seeded with random sample vectors
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = normalize_queries(sums)
+    return centroids
+
+def top_k_distinct(scores, labels, k):
+    """The k best (score, label) pairs with distinct labels, best first, padded with (-inf, -1)."""
+    order = np.argsort(-scores, kind="stable")
+    _, first = np.unique(labels[order], return_index=True)
+    best = order[np.sort(first)][:k]
+    result_scores = np.full(k, -np.inf, dtype=np.float32)
+    result_labels = np.full(k, -1, dtype=np.int64)
+    result_scores[:len(best)] = scores[best]
+    result_labels[:len(best)] = labels[best]
+    return result_scores, result_labels
+
+class _Segment:
+    """Items grouped by list (and by label within a list): list l is rows offsets[l]:offsets[l + 1]."""
+
+    def __init__(self, vectors, labels, codes, offsets):
+        self.vectors = vectors
+        self.labels = labels
+        self.codes = codes
+        self.offsets = offsets
+        # First item of each label within its list: scanning only these returns each label once
+        self.first_of_label = np.ones(len(labels), dtype=bool)
+        self.first_of_label[1:] = np.asarray(labels[1:]) != np.asarray(labels[:-1])
+        self.first_of_label[offsets[:-1][offsets[:-1] < len(labels)]] = True
+
+    @classmethod
+    def from_items(cls, vectors, labels, codes, assignments, nlist):
+        order = np.lexsort((labels, assignments))
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+        return cls(
+            np.ascontiguousarray(vectors[order], dtype=np.float32), labels[order],
+            {column: values[order] for column, values in codes.items()}, offsets,
+        )
+
+    @classmethod
+    def empty(cls, dim, columns, nlist):
+        return cls(
+            np.empty((0, dim), dtype=np.float32), np.empty(0, dtype=np.int64),
+            {column: np.empty(0, dtype=np.int32) for column in columns}, np.zeros(nlist + 1, dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.labels)
+
+    def assignments(self):
+        return np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+
+class IVFIndex:
+    """
+    Inverted-file (IVF-flat) index over unit vectors, scored by inner product (cosine).
+    k-means centroids split the items into lists and a query only scans the `nprobe` lists
+    closest to it. Each item has an int64 label, e.g. a vector id, and categorical metadata
+    that queries can filter on; a label repeated with different metadata is returned once.
+
+    Items are stored grouped by list, so a saved index is memory-mapped on load and every
+    probed list is a contiguous slice. Items added after loading are kept in a second,
+    in-memory segment that is searched alongside and merged into the files by `save`.
+    """
+
+    def __init__(self, centroids, metadata_columns=FILTER_COLUMNS, categories=None, trained_count=0):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nlist, self.dim = self.centroids.shape
+        self.metadata_columns = list(metadata_columns)
+        self.categories = {column: list((categories or {}).get(column, [])) for column in self.metadata_columns}
+        self.trained_count = trained_count
+        self._base = _Segment.empty(self.dim, self.metadata_columns, self.nlist)
+        self._added = _Segment.empty(self.dim, self.metadata_columns, self.nlist)
+        self._filter_cache = {}
+
+    @classmethod
+    def train(cls, vectors, nlist=None, metadata_columns=FILTER_COLUMNS, seed=0):
+        """Empty index with centroids trained on `vectors` (typically the vectors about to be added)."""
+        nlist = nlist or default_nlist(len(vectors))
+        return cls(train_centroids(vectors, nlist, seed=seed), metadata_columns, trained_count=len(vectors))
+
+    def __len__(self):
+        return len(self._base) + len(self._added)
+
+    def _encode_metadata(self, metadata):
+        """Category codes of the metadata columns, extending the categories with new values (-1 for missing)."""
+        codes = {}
+        for column in self.metadata_columns:
+            values = pd.Series(metadata[column], dtype=object).reset_index(drop=True)
+            known = pd.Index(self.categories[column])
+            new_values = pd.unique(values[values.notna() & ~values.isin(known)])
+            self.categories[column].extend(new_values.tolist())
+            codes[column] = pd.Index(self.categories[column]).get_indexer(values).astype(np.int32)
+        return codes
+
+    def add(self, labels, vectors, metadata):
+        """Add items: int64 labels, (n, dim) unit vectors and a DataFrame with the metadata columns."""
+        labels = np.asarray(labels, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = self._encode_metadata(metadata)
+        added = self._added
+        self._added = _Segment.from_items(
+            np.concatenate([added.vectors, vectors]), np.concatenate([added.labels, labels]),
+            {column: np.concatenate([added.codes[column], codes[column]]) for column in self.metadata_columns},
+            np.concatenate([added.assignments(), assign_lists(vectors, self.centroids)]), self.nlist,
+        )
+        self._filter_cache.clear()
+
+    def metadata_frame(self):
+        """Label and metadata values of every item, e.g. to find the items that are not indexed yet."""
+        frames = []
+        for segment in (self._base, self._added):
+            frame = pd.DataFrame({"label": np.asarray(segment.labels)})
+            for column in self.metadata_columns:
+                codes = np.asarray(segment.codes[column])
+                frame[column] = pd.Categorical.from_codes(codes, categories=self.categories[column]) \
+                    if self.categories[column] else pd.Categorical(np.full(len(codes), np.nan))
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def _select(self, filters):
+        """
+        Items matching `filters` ({column: value or list of values}): a dict with a boolean mask
+        per segment and the number of items, plus their vectors and labels once gathered.
+        """
+        filters = {
+            column: [values] if np.isscalar(values) or values is None else list(values)
+            for column, values in filters.items()
+        }
+        key = repr(sorted(filters.items()))
+        if key in self._filter_cache:
+            return self._filter_cache[key]
+        selection = {"masks": [], "count": 0}
+        for segment in (self._base, self._added):
+            mask = np.ones(len(segment), dtype=bool)
+            for column, values in filters.items():
+                # Lookup table over the category codes; the extra last entry is for missing values (-1)
+                accepted = np.zeros(len(self.categories[column]) + 1, dtype=bool)
+                codes = pd.Index(self.categories[column]).get_indexer(values)
+                accepted[codes[codes >= 0]] = True
+                mask &= accepted[segment.codes[column]]
+            selection["masks"].append(mask)
+            selection["count"] += int(mask.sum())
+        if len(self._filter_cache) >= FILTER_CACHE_SIZE:
+            self._filter_cache.pop(next(iter(self._filter_cache)))
+        self._filter_cache[key] = selection
+        return selection
+
+    def search(self, queries, k=10, nprobe=DEFAULT_NPROBE, filters=None, exact=False):
+        """
+        The k most similar distinct labels of each query vector, as (scores, labels) arrays of
+        shape (n_queries, k), padded with -inf / -1. `filters` maps metadata columns to a value
+        or a list of accepted values; `exact=True` scans every list (brute-force search).
+        """
+        queries = normalize_queries(queries)
+        selection = self._select(filters) if filters else None
+        if selection is not None and selection["count"] <= EXACT_SEARCH_MAX_ITEMS:
+            return self._search_selected(queries, k, selection)
+        masks = selection["masks"] if selection is not None else None
+
+        nprobe = self.nlist if exact else min(nprobe, self.nlist)
+        if nprobe < self.nlist:
+            probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), (len(queries), self.nlist))
+        # Queries of each probed list, so that every list is read once per batch
+        probe_queries = np.repeat(np.arange(len(queries)), nprobe)
+        probe_lists = probes.ravel()
+        order = np.argsort(probe_lists, kind="stable")
+        probe_lists, probe_queries = probe_lists[order], probe_queries[order]
+        bounds = np.flatnonzero(np.diff(probe_lists)) + 1
+
+        candidates = [[] for _ in range(len(queries))]
+        for segment_number, segment in enumerate((self._base, self._added)):
+            if not len(segment):
+                continue
+            for lists, query_ids in zip(np.split(probe_lists, bounds), np.split(probe_queries, bounds)):
+                start, end = segment.offsets[lists[0]], segment.offsets[lists[0] + 1]
+                if start == end:
+                    continue
+                vectors, labels = segment.vectors[start:end], np.asarray(segment.labels[start:end])
+                if masks is None:
+                    keep = segment.first_of_label[start:end]
+                else:
+                    # Labels are sorted within a list: keep the first matching item of each label
+                    matching = np.flatnonzero(masks[segment_number][start:end])
+                    keep = np.zeros(end - start, dtype=bool)
+                    if len(matching):
+                        keep[matching[np.r_[True, labels[matching][1:] != labels[matching][:-1]]]] = True
+                if not keep.all():
+                    vectors, labels = vectors[keep], labels[keep]
+                if not len(labels):
+                    continue
+                scores = vectors @ queries[query_ids].T
+                for column, query_id in enumerate(query_ids):
+                    column_scores = scores[:, column]
+                    if len(column_scores) > k:
+                        best = np.argpartition(-column_scores, k - 1)[:k]
+                        candidates[query_id].append((column_scores[best], labels[best]))
+                    else:
+                        candidates[query_id].append((column_scores, labels))
+        return self._collect(candidates, k)
+
+    def _search_selected(self, queries, k, selection):
+        """Exact scan of the items of a selective filter, gathered once and kept with the cached selection."""
+        if "vectors" not in selection:
+            segments = list(zip((self._base, self._added), selection["masks"]))
+            selection["vectors"] = np.concatenate([segment.vectors[mask] for segment, mask in segments])
+            selection["labels"] = np.concatenate([np.asarray(segment.labels[mask]) for segment, mask in segments])
+        scores = selection["vectors"] @ queries.T
+        return self._collect([[(scores[:, column], selection["labels"])] for column in range(len(queries))], k)
+
+    @staticmethod
+    def _collect(candidates, k):
+        result_scores = np.full((len(candidates), k), -np.inf, dtype=np.float32)
+        result_labels = np.full((len(candidates), k), -1, dtype=np.int64)
+        for query_id, parts in enumerate(candidates):
+            if parts:
+                scores = np.concatenate([part[0] for part in parts])
+                labels = np.concatenate([part[1] for part in parts])
+                result_scores[query_id], result_labels[query_id] = top_k_distinct(scores, labels, k)
+        return result_scores, result_labels
+
+    def save(self, path):
+        """
+        Write the index to a directory (replacing it), merging the added items into the lists
+        one list at a time, then reopen it memory-mapped.
+        """
+        temp_path = f"{path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        count = len(self)
+        segments = (self._base, self._added)
+        vectors = np.lib.format.open_memmap(os.path.join(temp_path, "vectors.npy"), "w+", np.float32, (count, self.dim))
+        labels = np.lib.format.open_memmap(os.path.join(temp_path, "labels.npy"), "w+", np.int64, (count,))
+        codes = {
+            column: np.lib.format.open_memmap(os.path.join(temp_path, f"codes_{column}.npy"), "w+", np.int32, (count,))
+            for column in self.metadata_columns
+        }
+        offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        position = 0
+        for list_id in range(self.nlist):
+            parts = [(segment, slice(segment.offsets[list_id], segment.offsets[list_id + 1])) for segment in segments]
+            list_labels = np.concatenate([np.asarray(segment.labels[rows]) for segment, rows in parts])
+            # Keep labels sorted within the list
+            order = np.argsort(list_labels, kind="stable")
+            end = position + len(order)
+            labels[position:end] = list_labels[order]
+            vectors[position:end] = np.concatenate([np.asarray(segment.vectors[rows]) for segment, rows in parts])[order]
+            for column in self.metadata_columns:
+                codes[column][position:end] = np.concatenate([np.asarray(segment.codes[column][rows]) for segment, rows in parts])[order]
+            position = offsets[list_id + 1] = end
+        for array in [vectors, labels, *codes.values()]:
+            array.flush()
+        del vectors, labels, codes
+        np.save(os.path.join(temp_path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(temp_path, "offsets.npy"), offsets)
+        with open(os.path.join(temp_path, "meta.json"), "w") as f:
+            json.dump({
+                "count": count, "nlist": self.nlist, "dim": self.dim, "trained_count": self.trained_count,
+                "metadata_columns": self.metadata_columns, "categories": self.categories,
+            }, f, default=str)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+        loaded = IVFIndex.load(path)
+        self._base, self._added = loaded._base, loaded._added
+        self._filter_cache.clear()
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Index saved by `save`; with mmap the vectors, labels and codes are memory-mapped, not read."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(np.load(os.path.join(path, "centroids.npy")), meta["metadata_columns"], meta["categories"], meta["trained_count"])
+        mmap_mode = "r" if mmap else None
+        index._base = _Segment(
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "labels.npy"), mmap_mode=mmap_mode),
+            {column: np.load(os.path.join(path, f"codes_{column}.npy"), mmap_mode=mmap_mode) for column in index.metadata_columns},
+            np.load(os.path.join(path, "offsets.npy")),
+        )
+        return index
+
+def similar_records(index, records, query_vectors, k=10, nprobe=DEFAULT_NPROBE, filters=None, label_column="obs_final_trns_vector_id"):
+    """
+    Records whose `label_column` vector is among the k nearest of each query vector, e.g. the
+    solutions of the observations most similar to a new symptom: a DataFrame with the query
+    number, rank and score of every hit joined to the matching records (restricted to `filters`).
+    """
+    scores, labels = index.search(query_vectors, k, nprobe=nprobe, filters=filters)
+    hits = pd.DataFrame({
+        "query": np.repeat(np.arange(len(labels)), k),
+        "rank": np.tile(np.arange(k), len(labels)),
+        "score": scores.ravel(),
+        label_column: labels.ravel(),
+    })
+    hits = hits[hits[label_column] >= 0]
+    for column, values in (filters or {}).items():
+        values = [values] if np.isscalar(values) or values is None else list(values)
+        records = records[records[column].isin(values)]
+    return hits.merge(records, on=label_column).sort_values(["query", "rank"], ignore_index=True)
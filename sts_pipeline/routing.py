@@ -0,0 +1,52 @@
+import os
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROJECT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "project_configs.json")
+
+# Source column -> (column filled when it is textual, column filled when it is coded)
+ROUTED_COLUMNS = {
+    "observation_category": ("observation_category_text", "observation_category_code"),
+    "problem_cause": ("problem_cause_text", "problem_cause_code"),
+}
+
+def load_project_configs(path=None):
+    """
+    Load the per-project column configuration from a JSON file.
+    Project names are exact and case-sensitive; each entry lists its
+    `textual_columns` and `coded_columns`.
+    """
+    with open(path or DEFAULT_PROJECT_CONFIG_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def project_mask(projects, project_names):
+    """Boolean row mask of `projects` in `project_names`, evaluated once per category when possible."""
+    if isinstance(projects.dtype, pd.CategoricalDtype):
+        # Missing values have code -1, which picks the trailing False
+        lookup = np.append(projects.cat.categories.isin(project_names), False)
+        return lookup[projects.cat.codes.to_numpy()]
+    return projects.isin(project_names).to_numpy()
+
+def route_project_columns(df, project_configs):
+    """
+    Fill observation_category_text/_code and problem_cause_text/_code from the
+    project configuration in one vectorized pass. Row order is preserved and
+    projects without a configuration get empty strings.
+    """
+    projects = df["project"]
+    unknown_projects = sorted(set(projects.unique()) - set(project_configs))
+    for project_name in unknown_projects:
+        logger.warning(f"No configuration found for project {project_name}")
+
+    for source_column, (text_column, code_column) in ROUTED_COLUMNS.items():
+        textual = [name for name, config in project_configs.items() if source_column in config["textual_columns"]]
+        coded = [name for name, config in project_configs.items() if source_column in config["coded_columns"]]
+        values = df[source_column].to_numpy(dtype=object) if source_column in df.columns else np.full(len(df), "", dtype=object)
+        df[text_column] = np.where(project_mask(projects, textual), values, "")
+        df[code_column] = np.where(project_mask(projects, coded), values, "")
+    return df
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# Declared schema: low-cardinality metadata columns are carried as pandas categoricals,
+# every other object column is stored as plain strings
+CATEGORY_COLUMNS = [
+    'project', 'database', 'language', 'fleet', 'subsystem', 'failure_class',
+    'problem_code', 'pbs_code', 'symptom_code', 'observation_category_code', 'problem_cause_code'
+]
+
+# Columns the knowledge base datasets are partitioned by
+PARTITION_COLUMNS = ['project', 'language']
+
+def apply_category_schema(df):
+    """Convert the declared CATEGORY_COLUMNS present in the DataFrame to the category dtype."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+def to_arrow_table(df, empty_as_null=False):
+    """
+    Convert a DataFrame to an Arrow table with an explicit column typing: categoricals
+    become dictionary arrays and object columns become strings (nulls preserved).
+    With `empty_as_null`, empty strings are stored as nulls like Dataiku does.
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for col in df.columns:
+        series = df[col]
+        if empty_as_null and isinstance(series.dtype, pd.CategoricalDtype) and "" in series.cat.categories:
+            series = series.cat.remove_categories([""])
+        elif empty_as_null and series.dtype == object:
+            series = series.mask(series == "")
+        if series.dtype == object:
+            try:
+                arrays.append(pa.array(series, type=pa.string(), from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed object column (e.g. floats and strings): store the string form
+                values = series.to_numpy(dtype=object)
+                nulls = pd.isna(values)
+                arrays.append(pa.array(np.where(nulls, None, values.astype(str)), type=pa.string()))
+        else:
+            arrays.append(pa.array(series, from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
@@ -0,0 +1,182 @@
+import os
+import shutil
+
+import pandas as pd
+
+from sts_pipeline.schema import to_arrow_table
+
+# Point STS_LOCAL_DATA_DIR at a directory to run the recipes on local Parquet/CSV files instead of Dataiku
+LOCAL_DATA_DIR_ENV = "STS_LOCAL_DATA_DIR"
+
+# Rows per chunk of filtered Dataiku reads
+DATAIKU_READ_CHUNK_SIZE = 200000
+
+def apply_filters(df, filters):
+    """Apply (column, op, value) filters in pandas; ops are ==, !=, in and not in."""
+    for column, op, value in filters or []:
+        if op in ("=", "=="):
+            df = df[df[column] == value]
+        elif op == "!=":
+            df = df[df[column] != value]
+        elif op == "in":
+            df = df[df[column].isin(value)]
+        elif op == "not in":
+            df = df[~df[column].isin(value)]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return df
+
+def with_stable_dictionary_types(table):
+    """
+    Use int32 indices and string values for every dictionary column, so that chunks with few,
+    many or no categories at all share one Arrow schema.
+    """
+    import pyarrow as pa
+
+    fields = [
+        pa.field(field.name, pa.dictionary(pa.int32(), pa.string() if pa.types.is_null(field.type.value_type) else field.type.value_type))
+        if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields))
+
+class DataikuDatasetWriter:
+    """Incremental writer of a Dataiku dataset; the schema is taken from the first DataFrame written."""
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+        self._writer = None
+
+    def write(self, df):
+        if self._writer is None:
+            self._dataset.write_schema_from_dataframe(df)
+            self._writer = self._dataset.get_writer()
+        self._writer.write_dataframe(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LocalDatasetWriter:
+    """
+    Incremental writer of a local Parquet dataset: every DataFrame written becomes its own
+    Parquet file(s) in the dataset directory, which is replaced when the writer is opened.
+    """
+
+    def __init__(self, path, partition_cols=None):
+        self.path = path
+        self.partition_cols = partition_cols
+        self._parts = 0
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+
+    def write(self, df):
+        import pyarrow.parquet as pq
+        table = with_stable_dictionary_types(to_arrow_table(df, empty_as_null=True))
+        if self.partition_cols and len(df):
+            pq.write_to_dataset(
+                table, self.path, partition_cols=self.partition_cols, basename_template=f"part-{self._parts}-{{i}}.parquet"
+            )
+        else:
+            pq.write_table(table, os.path.join(self.path, f"part-{self._parts}.parquet"))
+        self._parts += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class DataikuStorage:
+    """Datasets stored in the Dataiku flow. Partitioning is configured on the Dataiku datasets."""
+
+    def __init__(self):
+        import dataiku
+        self._dataiku = dataiku
+
+    def read(self, name, columns=None, filters=None, infer_types=True):
+        """
+        Read a dataset. Filters are not pushed down to Dataiku: a filtered read streams the whole
+        dataset in chunks and filters each one, so only the matching rows are held in memory.
+        """
+        dataset = self._dataiku.Dataset(name)
+        if not filters:
+            return dataset.get_dataframe(columns=columns, infer_with_pandas=infer_types)
+        chunks = [
+            apply_filters(chunk, filters)
+            for chunk in dataset.iter_dataframes(
+                chunksize=DATAIKU_READ_CHUNK_SIZE, columns=columns, infer_with_pandas=infer_types
+            )
+        ]
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def iter_chunks(self, name, chunksize, infer_types=True):
+        return self._dataiku.Dataset(name).iter_dataframes(chunksize=chunksize, infer_with_pandas=infer_types)
+
+    def write(self, name, df, partition_cols=None):
+        self._dataiku.Dataset(name).write_with_schema(df)
+
+    def open_writer(self, name, partition_cols=None):
+        """Writer whose `write(df)` appends a chunk of rows; use it as a context manager."""
+        return DataikuDatasetWriter(self._dataiku.Dataset(name))
+
+class LocalStorage:
+    """
+    Datasets stored under a local directory. Outputs are written as (optionally
+    hive-partitioned) Parquet directories, in one go or chunk by chunk, with empty strings
+    stored as nulls as in Dataiku; <name>.parquet and <name>.csv files are also accepted as inputs. Reads
+    support column projection and filters, which are pushed down to partitions and
+    row groups for Parquet.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _locate(self, name):
+        for path in (os.path.join(self.root, name), os.path.join(self.root, f"{name}.parquet")):
+            if os.path.exists(path):
+                return path, "parquet"
+        csv_path = os.path.join(self.root, f"{name}.csv")
+        if os.path.exists(csv_path):
+            return csv_path, "csv"
+        raise FileNotFoundError(f"Dataset '{name}' not found in {self.root}")
+
+    def read(self, name, columns=None, filters=None, infer_types=True):
+        path, file_format = self._locate(name)
+        if file_format == "csv":
+            return apply_filters(pd.read_csv(path, usecols=columns, dtype=None if infer_types else str), filters)
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, filters=filters or None, partitioning="hive")
+        return table.to_pandas()
+
+    def iter_chunks(self, name, chunksize, infer_types=True):
+        path, file_format = self._locate(name)
+        if file_format == "csv":
+            yield from pd.read_csv(path, chunksize=chunksize, dtype=None if infer_types else str)
+            return
+        import pyarrow.dataset as ds
+        for batch in ds.dataset(path, format="parquet", partitioning="hive").to_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+    def write(self, name, df, partition_cols=None):
+        with self.open_writer(name, partition_cols) as writer:
+            writer.write(df)
+
+    def open_writer(self, name, partition_cols=None):
+        """Writer whose `write(df)` appends a chunk of rows; use it as a context manager."""
+        return LocalDatasetWriter(os.path.join(self.root, name), partition_cols)
+
+def get_storage():
+    """Return the local storage backend if STS_LOCAL_DATA_DIR is set, otherwise the Dataiku one."""
+    root = os.environ.get(LOCAL_DATA_DIR_ENV)
+    return LocalStorage(root) if root else DataikuStorage()
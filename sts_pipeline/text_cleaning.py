@@ -0,0 +1,71 @@
+import re
+
+import regex
+import pandas as pd
+
+# Language-aware cleaning of 01_preprocessing.py: precompiled equivalents of its
+# LANGUAGE_CLEANERS, i.e. translate tables for the accent-stripping cleaners and compiled
+# patterns for the script filters
+LANGUAGE_TRANSLATION_TABLES = {
+    'fr': str.maketrans({'’': "'", 'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e', 'à': 'a', 'â': 'a', 'ô': 'o'}),
+    'es': str.maketrans('áéíóúñ', 'aeioun'),
+    'it': str.maketrans('àèéìòù', 'aeeiou'),
+    'sv': str.maketrans('åäö', 'aao'),
+}
+CYRILLIC_TEXT_FILTER = regex.compile(r'[^\p{Cyrillic}\p{Latin}\p{P}\p{N}\s@#$%&/\\=_\-+~°±№«»“”\'"…<>†™®©€₸₽]')
+LANGUAGE_FILTER_PATTERNS = {'ru': CYRILLIC_TEXT_FILTER, 'kk': CYRILLIC_TEXT_FILTER}
+NON_TEXT_PATTERN = regex.compile(r'[^\p{L}\p{N}\s\p{P}]')
+WHITESPACE_PATTERN = regex.compile(r'\s+')
+
+def clean_unique_texts(texts, lang):
+    """Clean an array of unique, non-null texts of one language exactly like clean_text of 01_preprocessing.py."""
+    cleaned = pd.Series(texts, dtype=object).map(str).str.normalize('NFC').str.strip()
+    if lang in LANGUAGE_TRANSLATION_TABLES:
+        cleaned = cleaned.str.translate(LANGUAGE_TRANSLATION_TABLES[lang])
+    elif lang in LANGUAGE_FILTER_PATTERNS:
+        cleaned = cleaned.map(lambda text: LANGUAGE_FILTER_PATTERNS[lang].sub('', text))
+    cleaned = cleaned.map(lambda text: WHITESPACE_PATTERN.sub(' ', NON_TEXT_PATTERN.sub('', text).strip()))
+    return cleaned.to_numpy(dtype=object)
+
+# Post-translation cleaning of 03_cleaning_post_translation (standard `re` semantics, whose
+# \s also matches the ASCII separators \x1c-\x1f unlike the `regex` patterns above)
+REPEATED_HYPHEN_WORD_PATTERN = re.compile(r'\b(\w+)\s*-\s*\1\b', flags=re.IGNORECASE)
+REPEATED_WORD_PATTERN = re.compile(r'\b(\w+)(\s+\1\b)+', flags=re.IGNORECASE)
+REPEATED_SYMBOL_PATTERN = re.compile(r'([^\w\s])\1+')
+SPACES_PATTERN = re.compile(r'\s+')
+
+def clean_translated_text(text):
+    """
+    Cleans a single text entry by:
+    1. Replacing 'N/A' and NaN-like values with an empty string.
+    2. Removing repeated words, technical text, code, or symbols (keeping a single instance).
+    3. Handling repeated words separated by a hyphen (e.g., "comp - comp" → "comp").
+    4. Trimming extra spaces.
+    Args:
+        text (str): The text to clean.
+    Returns:
+        str: The cleaned text.
+    """
+    if not isinstance(text, str) or text.strip().lower() in ["nan", "none"]:
+        return ""  # Replace non-string, NaN, or "nan"/"none" values with an empty string
+
+    # Replace 'N/A' with an empty string
+    text = text.replace("N/A", "").strip()
+
+    # Handle repeated words separated by a hyphen (e.g., "comp - comp" → "comp")
+    text = REPEATED_HYPHEN_WORD_PATTERN.sub(r'\1', text)
+
+    # Remove repeated words or symbols (e.g., "error error" → "error")
+    text = REPEATED_WORD_PATTERN.sub(r'\1', text)
+
+    # Remove repeating special characters or symbols (e.g., ---- or ####)
+    text = REPEATED_SYMBOL_PATTERN.sub(r'\1', text)
+
+    # Trim leading/trailing spaces and normalize multiple spaces to a single space
+    text = SPACES_PATTERN.sub(' ', text).strip()
+
+    return text
+
+def clean_translated_texts(texts):
+    """clean_translated_text of every text, as a list."""
+    return [clean_translated_text(text) for text in texts]
@@ -0,0 +1,124 @@
+import logging
+import functools
+
+import regex
+
+logger = logging.getLogger(__name__)
+
+# Decisions of classify_translation_need for texts routed past the LLM
+NO_LETTERS = "no_letters"
+CODES_ONLY = "codes_only"
+ENGLISH_TEXT = "english_text"
+
+LETTER_PATTERN = regex.compile(r"\p{L}")
+NON_LATIN_LETTER_PATTERN = regex.compile(r"[^\P{L}\p{Latin}]")
+NON_ASCII_LETTER_PATTERN = regex.compile(r"[^\P{L}a-zA-Z]")
+TOKEN_PATTERN = regex.compile(r"[\p{L}\p{N}°][\p{L}\p{N}./\-_#°]*")
+WORD_PATTERN = regex.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Part numbers, references and measures: a token with a digit
+CODE_TOKEN_PATTERN = regex.compile(r"(?=[^\d]*\d)[\p{L}\p{N}./\-_#°]+")
+
+# Domain tokens that read the same in every language of the fleet; other abbreviations
+# (HS, PB, RAS...) are source-language words and are translated
+DOMAIN_TOKENS = frozenset({
+    "ok", "nok", "n/a", "na", "nc", "p/n", "s/n", "ref", "id", "hvac", "tcms", "cctv", "pis", "led", "lcd", "gps",
+    "ac", "dc", "kv", "v", "ma", "w", "kw", "mm", "cm", "km", "kg", "bar", "hz", "rpm", "°c",
+})
+
+# Function words that never need the lexicon, and common words of the source languages spelled
+# like English words (de, la, sale, train, error...): their presence means the text is not English
+ENGLISH_FUNCTION_WORDS = frozenset({
+    "a", "an", "the", "and", "or", "not", "no", "of", "to", "in", "on", "at", "by", "for", "from", "with", "without",
+    "after", "before", "during", "under", "over", "between", "into", "out", "up", "down", "off", "is", "are", "was",
+    "were", "be", "been", "has", "have", "had", "it", "its", "this", "that", "these", "those", "as", "but", "if",
+    "then", "than", "so", "all", "any", "some", "both", "each", "per", "due", "when", "while", "again", "also",
+})
+SOURCE_LANGUAGE_WORDS = {
+    "fr": frozenset({"le", "la", "les", "de", "des", "du", "un", "une", "et", "est", "sur", "avec", "pour", "au",
+                     "aux", "en", "pas", "par", "dans", "sans", "ne", "porte", "panne", "voiture", "train", "sale",
+                     "arrive", "contact", "signal", "station", "service", "passage", "place", "pose", "message",
+                     "change", "course", "cause", "note", "commande", "front", "face", "pile", "rate", "sort",
+                     "tire", "son", "fin", "coin", "chose", "grave", "large", "long", "bas", "absent", "present",
+                     "normal", "moteur", "rame", "voie", "ligne", "essai", "test", "tension", "fuite", "secours",
+                     "vide", "plein", "mise", "prise", "bloc", "bouton", "alarme", "capot", "volet", "pare",
+                     "mobile", "simple", "double", "nature", "parole", "avis", "effet", "ensemble", "image", "marche"}),
+    "es": frozenset({"el", "la", "los", "las", "de", "del", "un", "una", "y", "es", "en", "con", "sin", "por",
+                     "para", "al", "no", "se", "coche", "sale", "once", "come", "dime", "son", "era", "mayor",
+                     "pan", "fin", "pie", "red", "real", "final", "general", "central", "total", "normal", "material",
+                     "plan", "motor", "sensor", "control", "error", "panel", "cable", "radio", "actual", "local",
+                     "terminal", "señal", "tren", "via", "nada", "todo", "bien", "mal", "alarma", "manual",
+                     "doble", "simple", "alto", "bajo", "largo", "corto", "lado", "tapa", "bomba", "hora"}),
+    "it": frozenset({"il", "lo", "la", "gli", "le", "di", "del", "della", "un", "una", "e", "con", "senza", "per",
+                     "in", "su", "non", "si", "carrozza", "porta", "come", "sale", "case", "fine", "fare", "dove",
+                     "cane", "mare", "male", "ore", "estate", "parole", "pane", "camera", "ape", "tempo", "volume",
+                     "display", "motore", "treno", "corsa", "lato", "basso", "alto", "pressione", "tensione",
+                     "segnale", "cavo", "luce", "vetro", "test", "prova", "normale", "manuale", "totale", "locale"}),
+    "sv": frozenset({"och", "av", "med", "utan", "för", "på", "i", "en", "ett", "är", "inte", "ej", "till", "vagn",
+                     "tag", "bra", "barn", "by", "far", "full", "glass", "hall", "kind", "rock", "slut", "stock",
+                     "hem", "fart", "gift", "men", "under", "ring", "start", "stopp", "bank", "mild", "sent",
+                     "test", "fel", "glas", "lampa", "dörr", "broms", "signal", "kontroll", "normal", "kabel"}),
+}
+
+# Rolling stock terms missing from WordNet's sense-tagged corpus that are still English
+ENGLISH_DOMAIN_WORDS = frozenset({
+    "pantograph", "compressor", "traction", "faulty", "bogie", "inverter", "converter", "actuator", "gearbox",
+    "coupler", "wiper", "damper", "odometer", "tachometer", "overheating", "malfunction", "malfunctioning",
+})
+
+# Texts detected as English need at least this many words (single words are often false friends)
+ENGLISH_MIN_WORDS = 2
+
+@functools.lru_cache(maxsize=None)
+def load_english_lexicon():
+    """nltk's WordNet corpus reader, or None when the corpus is not installed."""
+    try:
+        from nltk.corpus import wordnet
+        wordnet.ensure_loaded()
+        return wordnet
+    except (ImportError, LookupError) as e:
+        logger.warning(f"WordNet unavailable ({e}); English text in other languages is not detected")
+        return None
+
+@functools.lru_cache(maxsize=1 << 16)
+def english_word_count(word):
+    """
+    Sense-tagged corpus count of an English word (any inflection), None when it is not in the
+    lexicon; function words and domain words count as common.
+    """
+    if word in ENGLISH_FUNCTION_WORDS or word in ENGLISH_DOMAIN_WORDS:
+        return 1 << 20
+    wordnet = load_english_lexicon()
+    base = wordnet.morphy(word) if wordnet is not None else None
+    if base is None:
+        return None
+    return sum(lemma.count() for synset in wordnet.synsets(base) for lemma in synset.lemmas() if lemma.name().lower() == base)
+
+def is_code_token(token):
+    return token.lower() in DOMAIN_TOKENS or CODE_TOKEN_PATTERN.fullmatch(token) is not None
+
+@functools.lru_cache(maxsize=1 << 20)
+def classify_translation_need(text, language):
+    """
+    Why a non-English text needs no translation, or None when it must be translated:
+    NO_LETTERS (numbers and punctuation), CODES_ONLY (part numbers, references, units and
+    domain abbreviations, e.g. "P/N 1234-AB OK") or ENGLISH_TEXT (only Latin ASCII letters,
+    at least ENGLISH_MIN_WORDS words, all of them common English words and none a function
+    word of `language`). Common words are those seen in WordNet's sense-tagged corpus, which
+    leaves out rare lemmas that are source-language words, such as "porta" or "porte".
+    """
+    if not LETTER_PATTERN.search(text):
+        return NO_LETTERS
+    tokens = TOKEN_PATTERN.findall(text)
+    if all(is_code_token(token) for token in tokens):
+        return CODES_ONLY
+    # Script ratio: any letter outside ASCII Latin (accents, Cyrillic...) is not English
+    if NON_LATIN_LETTER_PATTERN.search(text) or NON_ASCII_LETTER_PATTERN.search(text):
+        return None
+    words = [word for token in tokens if not is_code_token(token) for word in WORD_PATTERN.findall(token.lower())]
+    source_words = SOURCE_LANGUAGE_WORDS.get(language, frozenset())
+    if any(word in source_words for word in words):
+        return None
+    if len(words) >= ENGLISH_MIN_WORDS and all(english_word_count(word) for word in words):
+        return ENGLISH_TEXT
+    return None
@@ -0,0 +1,58 @@
+import os
+import ast
+
+import numpy as np
+import pytest
+
+nltk_bleu = pytest.importorskip("nltk.translate.bleu_score")
+nltk_meteor = pytest.importorskip("nltk.translate.meteor_score")
+rouge = pytest.importorskip("rouge")
+
+from sts_pipeline.evaluation import METRIC_NAMES, TextTokens, score_pair
+
+RECIPE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "04_translation_evaluation")
+FUNCTIONS = ["evaluate_bleu", "evaluate_rouge", "evaluate_meteor", "evaluate_translation_metrics"]
+
+# (reference, candidate) pairs: exact and partial matches, no overlap, brevity penalty, several
+# sentences, repeated words, punctuation and case, one-word and very short texts
+PAIRS = [
+    ("The door is blocked on the platform side", "The door is blocked on the platform side"),
+    ("The door is blocked on the platform side", "Door blocked on platform side"),
+    ("Compressor replaced and tested OK", "The compressor was replaced, test OK"),
+    ("Brake pressure low", "Window cleaned"),
+    ("Air leak from the unit. Valve replaced. Test OK.", "Air leakage from unit. The valve was changed. Tested OK."),
+    ("Signal fault signal fault signal fault", "signal fault"),
+    ("door door door blocked", "door blocked blocked blocked"),
+    ("HVAC #2 fault, car 3 - reset done", "HVAC #2 failure car 3, reset done."),
+    ("Doors", "Doors"),
+    ("Doors", "Door"),
+    ("Emergency light flickering in the cab", "Emergency lights flicker in the driver's cab after the inspection"),
+    ("Replaced the filter. Cleaned the ducts.", "Cleaned the ducts. Replaced the filter."),
+]
+
+@pytest.fixture(scope="module")
+def evaluate_translation_metrics():
+    """The per-row nltk/rouge metrics of 04_translation_evaluation, loaded without running the recipe."""
+    pytest.importorskip("nltk.corpus").wordnet.synsets("door")
+    with open(RECIPE_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    nodes = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in FUNCTIONS]
+    assert len(nodes) == len(FUNCTIONS)
+    namespace = {
+        "sentence_bleu": nltk_bleu.sentence_bleu, "SmoothingFunction": nltk_bleu.SmoothingFunction,
+        "meteor_score": nltk_meteor.meteor_score, "Rouge": rouge.Rouge,
+    }
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), RECIPE_PATH, "exec"), namespace)
+    return namespace["evaluate_translation_metrics"]
+
+@pytest.mark.parametrize("reference, candidate", PAIRS)
+def test_score_pair_matches_reference_metrics(evaluate_translation_metrics, reference, candidate):
+    bleu, rouge_scores, meteor = evaluate_translation_metrics(reference, candidate)
+    expected = [bleu, rouge_scores["rouge-1"]["f"], rouge_scores["rouge-2"]["f"], rouge_scores["rouge-l"]["f"], meteor]
+    scores = score_pair(TextTokens(reference), TextTokens(candidate))
+    assert len(scores) == len(METRIC_NAMES)
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9)
+
+def test_texts_without_sentences_are_not_scored():
+    assert score_pair(TextTokens("..."), TextTokens("Door blocked")) is None
+    assert score_pair(TextTokens("Door blocked"), TextTokens("..")) is None
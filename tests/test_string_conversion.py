@@ -0,0 +1,43 @@
+import os
+import ast
+import contextlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RECIPE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "01_preprocessing.py")
+FUNCTIONS = ["has_mixed_types", "add_new_columns_and_convert_strings", "replace_nan_with_empty_string"]
+
+def frame():
+    return pd.DataFrame({
+        "all_nan": pd.Series([np.nan, np.nan, np.nan], dtype=object),
+        "all_none": pd.Series([None, None, None], dtype=object),
+        "text_with_nulls": pd.Series(["Porte bloquée", np.nan, None], dtype=object),
+        "text": pd.Series(["a", "b", "c"], dtype=object),
+        "text_and_numbers": pd.Series(["5", 5, 5.0], dtype=object),
+        "numbers": pd.Series([1.5, np.nan, 3.0]),
+    })
+
+@pytest.fixture(scope="module")
+def recipe():
+    """String conversion functions of 01_preprocessing.py, loaded without running the recipe."""
+    with open(RECIPE_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    nodes = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in FUNCTIONS]
+    assert len(nodes) == len(FUNCTIONS)
+    namespace = {"pd": pd, "np": np, "new_columns": [], "step_timer": lambda name, rows_in: contextlib.nullcontext()}
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), RECIPE_PATH, "exec"), namespace)
+    return namespace
+
+def test_converts_the_same_columns_as_the_per_value_type_scan(recipe):
+    df = frame()
+    converted = recipe["add_new_columns_and_convert_strings"](frame())
+    for col in df.columns:
+        expected = df[col].astype(str) if df[col].map(type).nunique() > 1 else df[col]
+        pd.testing.assert_series_equal(converted[col], expected)
+
+def test_all_null_columns_become_empty_strings(recipe):
+    df = recipe["replace_nan_with_empty_string"](recipe["add_new_columns_and_convert_strings"](frame()))
+    assert list(df["all_nan"]) == ["", "", ""]
+    assert list(df["all_none"]) == ["", "", ""]
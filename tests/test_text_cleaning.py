@@ -0,0 +1,53 @@
+import os
+import ast
+import logging
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pytest
+import regex
+
+from sts_pipeline.text_cleaning import clean_unique_texts
+
+RECIPE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "01_preprocessing.py")
+
+# Multilingual cells: accents (composed and decomposed), Cyrillic and other scripts, symbols and
+# emoji, null-like strings and irregular spacing
+CELLS = [
+    "Porte bloquée côté quai", "Fenêtre ouverte, voiture 3", "L’écran ne s’allume pas", "Porte bloquée",
+    "Reparación del freno", "Señal de emergencia activada", "Compresor averiado  ", "camión pequeño",
+    "Perdita d'aria dall'unità", "Città più vicina", "Però è così", "Dörr låst på vänster sida", "Åtgärdad OK",
+    "Дверь не закрывается", "Замена фильтра №3 «срочно»", "Есік жабылмайды – тексерілді", "Ёлка ₸500 ₽200",
+    "门 故障 door", "Ошибка 🚆 TCMS ✓", "P/N 1234-AB OK", "25 °C ± 2", "nan", "None", "N/A - N/A", "",
+    "   ", "  leading and   repeated\tspacing\n here  ", "tab\tand non-breaking space", "####", "12345",
+]
+LANGUAGES = ["fr", "es", "it", "sv", "ru", "kk", "en", "unknown"]
+
+@pytest.fixture(scope="module")
+def clean_text():
+    """clean_text of 01_preprocessing.py, with its LANGUAGE_CLEANERS, loaded without running the recipe."""
+    with open(RECIPE_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    nodes = [
+        node for node in tree.body
+        if (isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "LANGUAGE_CLEANERS" for target in node.targets))
+        or (isinstance(node, ast.FunctionDef) and node.name == "clean_text")
+    ]
+    assert len(nodes) == 2
+    namespace = {"re": regex, "pd": pd, "unicodedata": unicodedata, "logger": logging.getLogger(__name__)}
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), RECIPE_PATH, "exec"), namespace)
+    return namespace["clean_text"]
+
+@pytest.mark.parametrize("lang", LANGUAGES)
+def test_clean_unique_texts_matches_clean_text(clean_text, lang):
+    expected = [clean_text(text, lang) for text in CELLS]
+    assert list(clean_unique_texts(np.array(CELLS, dtype=object), lang)) == expected
+
+@pytest.mark.parametrize("lang", LANGUAGES)
+def test_null_cells_clean_to_empty_string(clean_text, lang):
+    # clean_text_column factorizes a column: nulls get code -1, which picks a trailing empty string
+    values = np.array(["Porte  bloquée", None, np.nan, "Porte  bloquée"], dtype=object)
+    codes, uniques = pd.factorize(values)
+    cleaned = np.append(clean_unique_texts(uniques, lang), "")[codes]
+    assert list(cleaned) == [clean_text(value, lang) for value in values]